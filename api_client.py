@@ -2,55 +2,267 @@
 # The `APIClient` class provides an asynchronous HTTP client for interacting with external APIs.
 # It handles POST and GET requests, processes responses, and includes logging functionality.
 
+import asyncio
+import dataclasses
+import hashlib
 import httpx
+import importlib.util
 import logging
-from typing import Optional, Any
+import orjson
+import os
+from typing import Awaitable, Optional, Any
 from pathlib import Path
+from libs.disk_cache import DiskCache
+
+# Payload fields that name a local file; the cache key includes its identity and
+# version, so a replaced or edited file at the same path is re-analyzed
+_FILE_FIELDS = ("image", "audio")
 
-import logging
-from log_service import setup_logging
+
+def _is_transient(status_code: int) -> bool:
+    """Server-side failures and rate limiting, worth another attempt"""
+    return status_code >= 500 or status_code == 429
 
 
 class APIClient:
-    def __init__(self, config):
+    def __init__(self, config, logger: Optional[logging.Logger] = None):
         self.config = config
-        self.logger = logging.getLogger(__name__)
-        self.client = httpx.AsyncClient(timeout=30)
-        # Setup logging before using it
-        setup_logging(config)  # Make sure logging is configured
+        # Logging is configured once at application start-up
+        self.logger = logger or logging.getLogger(__name__)
+        processing = config.processing
+        # HTTP/2 multiplexes the per-image requests over one connection per host
+        http2 = processing.http2
+        if http2 and importlib.util.find_spec("h2") is None:
+            self.logger.warning(
+                'HTTP/2 needs the h2 package (pip install "httpx[http2]"), '
+                "falling back to HTTP/1.1"
+            )
+            http2 = False
+        self.client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=processing.max_connections,
+                max_keepalive_connections=processing.max_keepalive_connections,
+                # httpx drops idle connections after 5s by default; scenes and
+                # files arrive in bursts, so keep them for the next burst
+                keepalive_expiry=processing.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(
+                processing.timeout, connect=processing.connect_timeout
+            ),
+        )
+        # Service endpoints and headers never change at runtime, resolve them once
+        # (ApiConfig uses slots, so it has no __dict__ to iterate)
+        api_fields = [
+            (f.name, getattr(config.api, f.name))
+            for f in dataclasses.fields(config.api)
+        ]
+        self._urls = {
+            name.removesuffix("_url"): value
+            for name, value in api_fields
+            if name.endswith("_url")
+        }
+        self._service_headers = {
+            name.removesuffix("_header"): value
+            for name, value in api_fields
+            if name.endswith("_header")
+        }
+        # Bounds how many requests analyze_image_all keeps in flight
+        self._sem = asyncio.Semaphore(processing.max_concurrent_api)
+        self._cache = (
+            DiskCache(
+                config.paths.ramdisk_dir / "api_cache",
+                processing.api_cache_size * 1024 * 1024,
+                ".json",
+            )
+            if processing.api_cache_size > 0
+            else None
+        )
+
+    async def aclose(self):
+        """Close the underlying HTTP connection pool"""
+        await self.client.aclose()
 
-        # Directly use the root logger
-        self.logger = logging.getLogger()  # No need to use __name__ here
+    async def post_request(
+        self,
+        endpoint: str,
+        payload: dict,
+        headers: Optional[dict] = None,
+        files: Optional[dict] = None,
+    ) -> Optional[dict]:
+        """POST `payload` as JSON, or as multipart form fields next to `files`"""
+        return await self._cached_request("POST", endpoint, payload, headers, files)
 
-    async def post_request(self, endpoint: str, payload: dict) -> Optional[dict]:
+    async def get_request(
+        self, endpoint: str, payload: dict, headers: Optional[dict] = None
+    ) -> Optional[dict]:
+        return await self._cached_request("GET", endpoint, payload, headers)
+
+    async def _cached_request(
+        self,
+        method: str,
+        endpoint: str,
+        payload: dict,
+        headers: Optional[dict],
+        files: Optional[dict] = None,
+    ) -> Optional[dict]:
+        """Send a request, serving repeated (endpoint, payload) pairs from disk"""
+        # Uploads are not cached: the key would have to hash the file contents
+        cache_key = None
+        if self._cache is not None and not files:
+            # stat() and file reads stay off the loop driving every other request
+            cache_key, cached = await asyncio.to_thread(
+                self._cache_lookup, method, endpoint, payload
+            )
+            if cached is not None:
+                self.logger.debug("API cache hit for %s %s", method, endpoint)
+                return cached
+
+        if files:
+            request_args = {"data": payload, "files": files}
+        elif method == "GET":
+            request_args = {"params": payload or None}
+        else:
+            # Serialized with orjson; httpx's json= goes through the stdlib
+            request_args = {"content": orjson.dumps(payload)}
+            headers = {"content-type": "application/json", **(headers or {})}
         try:
-            resp = await self.client.post(endpoint)
+            resp = await self._request_with_retry(
+                method, endpoint, headers=headers, **request_args
+            )
             resp.raise_for_status()
-            return resp.json()
+            data = orjson.loads(resp.content)
         except httpx.RequestError as e:
             self.logger.error(f"API request failed: {e}")
             return None
+        except httpx.HTTPStatusError as e:
+            self.logger.error(
+                "API request to %s failed with HTTP %d",
+                endpoint,
+                e.response.status_code,
+            )
+            return None
+        except orjson.JSONDecodeError as e:
+            self.logger.error("API response from %s is not valid JSON: %s", endpoint, e)
+            return None
+
+        if cache_key:
+            await asyncio.to_thread(self._store_cached, cache_key, orjson.dumps(data))
+        return data
+
+    async def _request_with_retry(
+        self, method: str, endpoint: str, **kwargs
+    ) -> httpx.Response:
+        """Retry transport errors, 5xx and 429 responses with exponential backoff.
 
-    async def get_request(self, endpoint: str, payload: dict) -> Optional[dict]:
+        The last response is returned as is once the attempts run out.
+        """
+        attempts = max(1, self.config.processing.max_retries)
+        for attempt in range(1, attempts + 1):
+            try:
+                resp = await self.client.request(method, endpoint, **kwargs)
+            except httpx.RequestError as e:
+                if attempt == attempts:
+                    raise
+                reason = e
+            else:
+                if attempt == attempts or not _is_transient(resp.status_code):
+                    return resp
+                reason = f"HTTP {resp.status_code}"
+            delay = min(0.25 * 2 ** (attempt - 1), 8)
+            self.logger.warning(
+                "API request to %s failed (%s), retry %d/%d in %.2fs",
+                endpoint,
+                reason,
+                attempt,
+                attempts - 1,
+                delay,
+            )
+            await asyncio.sleep(delay)
+
+    def _cache_key(self, method: str, endpoint: str, payload: dict) -> Optional[str]:
+        """Cache key for a request, or None if the request can't be cached"""
+        key = hashlib.sha256(
+            f"{method} {endpoint}".encode()
+            + orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+        )
+        for field in _FILE_FIELDS:
+            if field in payload:
+                try:
+                    st = os.stat(payload[field])
+                except (OSError, TypeError, ValueError):
+                    return None  # Let the service report the missing file
+                key.update(
+                    f"|{st.st_dev}-{st.st_ino}-{st.st_mtime_ns}-{st.st_size}".encode()
+                )
+        return key.hexdigest()
+
+    def _cache_lookup(
+        self, method: str, endpoint: str, payload: dict
+    ) -> tuple[Optional[str], Optional[dict]]:
+        """Blocking: the request's cache key and its cached response, if any"""
+        key = self._cache_key(method, endpoint, payload)
+        if key is None:
+            return None, None
+        data = self._cache.get(key)
+        if data is None:
+            return key, None
         try:
-            resp = await self.client.get(endpoint)
-            resp.raise_for_status()
-            return resp.json()
-        except httpx.RequestError as e:
-            self.logger.error(f"API request failed: {e}")
-            return None
+            return key, orjson.loads(data)
+        except orjson.JSONDecodeError:
+            return key, None  # Truncated entry, fetch it again
+
+    def _store_cached(self, key: str, data: bytes):
+        """Blocking: write a response to the cache"""
+        try:
+            self._cache.put(key, data)
+        except OSError as e:
+            self.logger.warning("Could not cache API response %s: %s", key, e)
 
     async def get_image_analysis(
         self, image_path: Path, service_type: str
     ) -> Optional[dict]:
-        url = getattr(self.config.api, f"{service_type}_url")
+        url = self._urls[service_type]
         payload = {
             "image": str(image_path),
             "confidence": self.config.processing.obj_confidence,
         }
-        return await self.post_request(url, payload)
+        return await self.post_request(url, payload, self._headers(service_type))
+
+    async def analyze_image_all(
+        self, image_path: Path, service_types: list[str]
+    ) -> dict[str, Optional[dict]]:
+        """Run several independent image analyses concurrently"""
+        results = await asyncio.gather(
+            *(
+                self._guarded(self.get_image_analysis(image_path, service_type))
+                for service_type in service_types
+            )
+        )
+        return dict(zip(service_types, results))
+
+    async def _guarded(self, coro: Awaitable):
+        async with self._sem:
+            return await coro
 
     async def transcribe_audio(self, audio_path: Path) -> Optional[str]:
         payload = {"audio": str(audio_path), "model": "medium"}  # Configurable
-        response = await self.post_request(self.config.api.transcribe_url, payload)
+        response = await self.post_request(
+            self.config.api.transcribe_url, payload, self._headers("transcribe")
+        )
         return response.get("transcription") if response else None
+
+    def _headers(self, service_type: str) -> Optional[dict]:
+        """Return the configured request headers for a service, if any"""
+        return self._service_headers.get(service_type)
+
+
+_api_client: Optional[APIClient] = None
+
+
+def get_api_client(config) -> APIClient:
+    """Return the process-wide APIClient so every workflow shares one pool"""
+    global _api_client
+    if _api_client is None:
+        _api_client = APIClient(config)
+    return _api_client
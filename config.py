@@ -1,11 +1,17 @@
 # config.py
+import os
 from dataclasses import dataclass
 from dataclasses import field
 from pathlib import Path
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Union
 
+JSON_HEADER = {"content-type": "application/json"}
 
-@dataclass
+IMAGE_EXTENSIONS = frozenset({".jpg", ".jpeg", ".png", ".heic", ".webp"})
+VIDEO_EXTENSIONS = frozenset({".mp4", ".mov", ".avi", ".mkv"})
+
+
+@dataclass(slots=True)
 class ApiConfig:
     """Configuration for external API services"""
 
@@ -25,14 +31,16 @@ class ApiConfig:
     # ["tiny", "base", "small", "medium", "large-v1", "large-v2"]
     clarifai_model: str = "general-image-recognition"
     caption_model: str = "blip-large"
-    caption_header: str = '{"content-type": "application/json"}'
-    ocr_header: str = '{"content-type": "application/json"}'
-    rating_header: str = '{"content-type": "application/json"}'
-    obj_detection_header: str = '{"content-type": "application/json"}'
-    transcribe_header: str = '{"content-type": "application/json"}'
+    caption_header: Dict[str, str] = field(default_factory=lambda: dict(JSON_HEADER))
+    ocr_header: Dict[str, str] = field(default_factory=lambda: dict(JSON_HEADER))
+    rating_header: Dict[str, str] = field(default_factory=lambda: dict(JSON_HEADER))
+    obj_detection_header: Dict[str, str] = field(
+        default_factory=lambda: dict(JSON_HEADER)
+    )
+    transcribe_header: Dict[str, str] = field(default_factory=lambda: dict(JSON_HEADER))
 
 
-@dataclass
+@dataclass(slots=True)
 class PathConfig:
     """File system paths configuration"""
 
@@ -46,9 +54,10 @@ class PathConfig:
     unknown_faces_dir: Path
     temp_dir: Path
     secrets_path: Path
+    state_db: Optional[Path] = None  # SQLite file remembering processed files
 
 
-@dataclass
+@dataclass(slots=True)
 class ProcessingConfig:
     """Media processing parameters"""
 
@@ -56,6 +65,8 @@ class ProcessingConfig:
     face_distance_threshold: float = 0.5
     max_faces: int = 10
     colors_to_detect: int = 5
+    color_sample_size: int = 250000  # max pixels histogrammed per image
+    resize_cache_size: int = 0  # MB of resized images kept in ramdisk_dir, 0 disables
     ocr_confidence: float = 0.7
     ocr_lang: str = "en"
     image_rating_overwrite: bool = False
@@ -94,21 +105,41 @@ By integrating these elements, each description will offer a rich, multifaceted
     sampling_strategy: List[float] = (0.1, 0.5, 0.9)
     frames_per_second: float = 0.2
     transcribe_size_threshold: int = 50  # MB
+    color_analysis_seed: int = 42
 
     # General
     max_retries: int = 3
+    api_cache_size: int = 0  # MB of API responses kept in ramdisk_dir, 0 disables
+    video_colors_cache_size: int = 4  # MB of video palettes in ramdisk_dir, 0 disables
     timeout: int = 30  # seconds
+    connect_timeout: float = 5.0  # seconds
+    http2: bool = True  # needs httpx[http2], falls back to HTTP/1.1 without it
+    max_connections: int = 1000
+    max_keepalive_connections: int = 100
+    keepalive_expiry: float = 60.0  # seconds an idle connection is kept for reuse
+    max_concurrent_api: int = 32  # in-flight requests per analyze_image_all
+    task_concurrency: int = 8  # media files processed at the same time
     min_file_age: int = 60  # seconds
-    metadata_behavior: str = "append"
+    # One behavior for every field, or a per-field dict (unlisted fields append)
+    metadata_behavior: Union[str, Dict[str, str]] = "append"
     simulate_processing: bool = True
     recursive_search: bool = True
     conflict_resolution: str = "overwrite"
     rename_suffix: str = "_{counter}"
     watch_interval: int = 5  # seconds
+    use_fs_events: bool = True  # watchdog events; polls every watch_interval otherwise
+    # Threads scanning the watch folder
+    scan_workers: int = field(
+        default_factory=lambda: min(32, (os.cpu_count() or 1) * 4)
+    )
+    thread_pool_size: int = 32  # default executor used by asyncio.to_thread
+    # Threads for decode/resize, color analysis and face encodings; these
+    # (OpenCV, numpy, dlib) release the GIL, so threads scale without extra RSS
+    cpu_workers: int = field(default_factory=lambda: os.cpu_count() or 1)
     ramdisk_size: int = 512
 
 
-@dataclass
+@dataclass(slots=True)
 class ImageWorkflowConfig:
     """Image processing workflow settings"""
 
@@ -125,7 +156,7 @@ class ImageWorkflowConfig:
     move_processed_media: bool = True
 
 
-@dataclass
+@dataclass(slots=True)
 class VideoWorkflowConfig:
     """Video processing workflow settings"""
 
@@ -146,7 +177,7 @@ class VideoWorkflowConfig:
     move_processed_media: bool = True
 
 
-@dataclass
+@dataclass(slots=True)
 class GeneralWorkflowConfig:
     """General workflow settings"""
 
@@ -154,7 +185,7 @@ class GeneralWorkflowConfig:
     preserve_originals: bool = False
 
 
-@dataclass
+@dataclass(slots=True)
 class WorkflowConfig:
     """Main workflow configuration grouping"""
 
@@ -163,7 +194,7 @@ class WorkflowConfig:
     general: GeneralWorkflowConfig = field(default_factory=GeneralWorkflowConfig)
 
 
-@dataclass
+@dataclass(slots=True)
 class LoggingConfig:
     """Logging configuration"""
 
@@ -173,7 +204,7 @@ class LoggingConfig:
     format: str = "[%(asctime)s][%(name)s][%(levelname)s] %(message)s"
 
 
-@dataclass
+@dataclass(slots=True)
 class AppConfig:
     """Root application configuration"""
 
@@ -185,9 +216,9 @@ class AppConfig:
 
     # Derived properties
     @property
-    def image_extensions(self) -> tuple:
-        return (".jpg", ".jpeg", ".png", ".heic", ".webp")
+    def image_extensions(self) -> frozenset:
+        return IMAGE_EXTENSIONS
 
     @property
-    def video_extensions(self) -> tuple:
-        return (".mp4", ".mov", ".avi", ".mkv")
+    def video_extensions(self) -> frozenset:
+        return VIDEO_EXTENSIONS
@@ -0,0 +1,71 @@
+# directory_watcher.py
+# The `DirectoryWatcher` class turns file system notifications (inotify on Linux, FSEvents on macOS,
+# via watchdog) into an asyncio queue of paths, so the controller does not re-walk the watch folder.
+
+import asyncio
+import logging
+import os
+from pathlib import Path
+
+
+class DirectoryWatcher:
+    def __init__(
+        self,
+        watch_dir: Path,
+        extensions: frozenset,
+        recursive: bool = True,
+        excluded_dirs: frozenset = frozenset(),
+    ):
+        self.watch_dir = Path(watch_dir)
+        self.extensions = extensions
+        self.recursive = recursive
+        # Events under these folders (e.g. the destination folders) are ignored
+        self._excluded_prefixes = tuple(
+            d.rstrip(os.sep) + os.sep for d in excluded_dirs
+        )
+        self.logger = logging.getLogger(__name__)
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._observer = None
+
+    def start(self):
+        """Start watching; raises ImportError when watchdog is not installed"""
+        # Imported lazily so watchdog stays optional (polling is the fallback)
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+
+        loop = asyncio.get_running_loop()
+        watcher = self
+
+        class _Handler(FileSystemEventHandler):
+            # Runs on the observer thread: hand paths to the event loop
+            def on_closed(self, event):
+                if not event.is_directory:
+                    watcher._post(loop, event.src_path)
+
+            def on_moved(self, event):
+                if not event.is_directory:
+                    watcher._post(loop, event.dest_path)
+
+        self._observer = Observer()
+        self._observer.schedule(
+            _Handler(), str(self.watch_dir), recursive=self.recursive
+        )
+        self._observer.start()
+        self.logger.info("Watching %s for file events", self.watch_dir)
+
+    def _post(self, loop: asyncio.AbstractEventLoop, path: str):
+        file_path = Path(path)
+        if file_path.suffix.lower() in self.extensions and not path.startswith(
+            self._excluded_prefixes
+        ):
+            loop.call_soon_threadsafe(self._queue.put_nowait, file_path)
+
+    async def get(self) -> Path:
+        """Wait for the next file that finished being written or was moved in"""
+        return await self._queue.get()
+
+    def stop(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
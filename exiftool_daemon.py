@@ -0,0 +1,108 @@
+# exiftool_daemon.py
+# The `ExifToolDaemon` class keeps a single `exiftool -stay_open` process running and feeds it
+# commands over stdin, so reading or writing metadata does not pay the Perl start-up cost per file.
+
+import asyncio
+import orjson
+import logging
+from pathlib import Path
+from typing import Optional
+
+_READY = b"{ready}\n"
+# exiftool JSON for a single file easily exceeds asyncio's 64 KiB default
+_STREAM_LIMIT = 16 * 1024 * 1024
+
+
+def _encode_arg(arg: str) -> str:
+    """Encode one argument as an exiftool argfile line"""
+    if "\n" in arg or "\r" in arg:
+        # Argfile lines are newline separated; #[CSTR] enables C-style escapes
+        escaped = arg.replace("\\", "\\\\").replace("\r", "\\r").replace("\n", "\\n")
+        return f"#[CSTR]{escaped}"
+    return arg
+
+
+class ExifToolDaemon:
+    def __init__(self, executable: str = "exiftool"):
+        self.executable = executable
+        self.logger = logging.getLogger(__name__)
+        self._proc: Optional[asyncio.subprocess.Process] = None
+        self._lock = asyncio.Lock()
+
+    async def _start(self):
+        self._proc = await asyncio.create_subprocess_exec(
+            self.executable,
+            "-stay_open",
+            "True",
+            "-@",
+            "-",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=_STREAM_LIMIT,
+        )
+        self.logger.debug("Started exiftool daemon (pid %s)", self._proc.pid)
+
+    async def execute(self, *args: str) -> bytes:
+        """Run one exiftool command and return its stdout"""
+        lines = [_encode_arg(str(arg)) for arg in args]
+        # -echo4 marks the end of this command's stderr output
+        lines += ["-echo4", "{ready}", "-execute"]
+
+        async with self._lock:
+            if self._proc is None or self._proc.returncode is not None:
+                await self._start()
+            try:
+                self._proc.stdin.write(("\n".join(lines) + "\n").encode())
+                await self._proc.stdin.drain()
+                stdout = await self._proc.stdout.readuntil(_READY)
+                stderr = await self._proc.stderr.readuntil(_READY)
+            except asyncio.IncompleteReadError as e:
+                await self._discard()
+                raise RuntimeError("exiftool daemon exited unexpectedly") from e
+            except BaseException:
+                # Cancelled or timed out mid-command: the next caller would read
+                # this command's output, so start over with a fresh process
+                await self._discard()
+                raise
+
+        stdout = stdout[: -len(_READY)]
+        stderr = stderr[: -len(_READY)].decode(errors="replace").strip()
+        if any(line.startswith("Error") for line in stderr.splitlines()):
+            raise RuntimeError(f"exiftool failed: {stderr}")
+        if stderr:
+            self.logger.debug("exiftool: %s", stderr)
+        return stdout
+
+    async def _discard(self):
+        """Kill the current process; the next command starts a new one"""
+        proc, self._proc = self._proc, None
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+
+    async def get_metadata(self, path: str | Path, *args: str) -> dict:
+        """Return the exiftool JSON metadata of a single file"""
+        output = await self.execute("-json", *args, str(path))
+        return orjson.loads(output)[0]
+
+    async def close(self):
+        """Ask the exiftool process to exit and wait for it"""
+        async with self._lock:
+            if self._proc is None or self._proc.returncode is not None:
+                return
+            self._proc.stdin.write(b"-stay_open\nFalse\n")
+            await self._proc.stdin.drain()
+            await self._proc.wait()
+            self._proc = None
+
+
+_daemon: Optional[ExifToolDaemon] = None
+
+
+def get_exiftool() -> ExifToolDaemon:
+    """Return the process-wide exiftool daemon"""
+    global _daemon
+    if _daemon is None:
+        _daemon = ExifToolDaemon()
+    return _daemon
@@ -0,0 +1,440 @@
+import asyncio
+import errno
+import hashlib
+import io
+import shutil
+import os
+import time
+from concurrent.futures import Executor
+from pathlib import Path
+import logging
+from datetime import datetime  # Correct import for datetime
+import cv2
+import numpy as np
+import orjson
+from typing import Optional, Tuple
+from config import IMAGE_EXTENSIONS, VIDEO_EXTENSIONS
+from exiftool_daemon import get_exiftool
+from libs.disk_cache import DiskCache
+
+try:
+    # libjpeg-turbo's SIMD codec is several times faster than OpenCV's libjpeg
+    from turbojpeg import TurboJPEG, TJPF_BGR, TJPF_RGB
+
+    _turbo_jpeg = TurboJPEG()
+except (ImportError, OSError, RuntimeError):
+    _turbo_jpeg = None
+
+JPEG_QUALITY = 90
+
+
+class FileManager:
+    def __init__(self, config, cpu_pool: Optional[Executor] = None):
+        self.config = config
+        # Executor for decode/resize; None uses the loop's default executor
+        self.cpu_pool = cpu_pool
+        self.logger = logging.getLogger(__name__)
+        self.processed_files: set[str] = set()
+        # Destination folders already known to exist
+        self._known_dirs: set[str] = set()
+        self.exiftool = get_exiftool()
+        # Bounds concurrent ffprobe processes
+        self._probe_sem = asyncio.Semaphore(os.cpu_count() or 1)
+        cache_size = config.processing.resize_cache_size
+        self._resize_cache = (
+            DiskCache(
+                config.paths.ramdisk_dir / "resize", cache_size * 1024 * 1024, ".jpg"
+            )
+            if cache_size > 0
+            else None
+        )
+        # setup_logging(config)  # Ensure logging is configured
+
+    async def organize_file(
+        self,
+        path: str | Path,
+        conflict_resolution: str = "skip",
+        rename_suffix: str = "_{counter}",
+        st: Optional[os.stat_result] = None,
+    ) -> str:
+        """
+        Organize a file into the destination directory based on its creation/modification time.
+
+        Args:
+            path (str | Path): Path to the file to organize.
+            conflict_resolution (str, optional):
+                Strategy for handling file name conflicts at destination.
+                Options: 'skip' (default), 'overwrite', 'rename'.
+            rename_suffix (str, optional):
+                Suffix to append when renaming files. Defaults to "_{counter}".
+            st (os.stat_result, optional):
+                The file's stat result when the caller already has it (e.g. from
+                the directory scan), which saves stat()ing the file again.
+
+        Returns:
+            str: The final path of the organized file or an error message.
+
+        Raises:
+            ValueError: If an invalid conflict_resolution strategy is provided.
+        """
+        if isinstance(path, str):
+            path = Path(path)
+
+        base_dest = self.config.paths.image_dest
+        destination_folder, file_name = await self._get_destination_info(
+            path, base_dest, st
+        )
+
+        # Create destination folder
+        self._create_destination_folder(destination_folder)
+
+        # Handle file name conflicts based on strategy
+        final_path = Path(destination_folder) / file_name
+
+        if not final_path.exists():
+            self.logger.info(f"Moving '{path}' to '{final_path}'")
+            self._move_file(path, final_path)
+            return str(final_path)
+        else:
+            match conflict_resolution:
+                case "skip":
+                    self.logger.warning(
+                        f"Skipping file '{path}'. File already exists at '{final_path}'."
+                    )
+                    return f"File not moved: Destination {final_path} already exists."
+                case "overwrite":
+                    self.logger.info(f"Overwriting existing file at '{final_path}'")
+                    self._move_file(path, final_path)
+                    return str(final_path)
+                case "rename":
+                    new_name = await self._handle_rename(
+                        final_path, suffix=rename_suffix
+                    )
+                    if new_name:
+                        self.logger.info(
+                            f"Renaming '{path}' to '{new_name}' and moving."
+                        )
+                        self._move_file(path, new_name)
+                        return str(new_name)
+                    else:
+                        error_msg = (
+                            f"Failed to find a unique name for '{path}'. "
+                            "File not moved."
+                        )
+                        self.logger.error(error_msg)
+                        return error_msg
+                case _:
+                    raise ValueError(
+                        f"Invalid conflict_resolution strategy: {conflict_resolution}"
+                    )
+
+    def _move_file(self, src: Path, dst: Path) -> None:
+        """Move a file, renaming in place when both paths share a filesystem."""
+        try:
+            os.replace(src, dst)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            # Different filesystems: fall back to copy + unlink
+            shutil.move(str(src), str(dst))
+
+    async def _get_destination_info(
+        self, path: Path, base_dest: str, st: Optional[os.stat_result] = None
+    ) -> tuple[str, str]:
+        """Determine the destination folder and filename based on file creation/modification time."""
+        # A single stat both checks existence and provides the fallback ctime
+        if st is None:
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                raise FileNotFoundError(f"File '{path}' does not exist.") from None
+
+        # Determine file type-specific metadata
+        suffix = (
+            path.suffix.lower()
+        )  # Get the extension as a string and convert to lowercase
+
+        if suffix in IMAGE_EXTENSIONS:
+            metadata = await self._get_image_metadata(str(path))
+            created_time = metadata.get("DateTimeOriginal", None)
+        elif suffix in VIDEO_EXTENSIONS:
+            metadata = await self._get_video_metadata(str(path))
+            created_time = metadata.get("creation_time", None)
+        else:
+            created_time = st.st_ctime
+
+        # Handle creation time; only strings need parsing, the other cases
+        # already give a datetime (no strftime/strptime round trip)
+        if isinstance(created_time, float):
+            file_date = datetime.fromtimestamp(created_time)
+        elif created_time and isinstance(created_time, str):
+            file_date = await self._parse_timestamp(created_time.split(".")[0])
+        else:
+            file_date = datetime.now()
+
+        destination_folder = os.path.join(
+            base_dest, str(file_date.year), f"{file_date.month:02d}"
+        )
+
+        return destination_folder, path.name
+
+    def _create_destination_folder(self, directory_path: str) -> None:
+        """Create the target directory, opening up permissions on new folders only."""
+        if directory_path in self._known_dirs:
+            return
+
+        directory = Path(directory_path)
+        missing = []
+        while not directory.exists():
+            missing.append(directory)
+            directory = directory.parent
+
+        if missing:
+            os.makedirs(directory_path, exist_ok=True)
+            # Set read/write/execute for everyone, outermost folder first
+            for new_dir in reversed(missing):
+                os.chmod(new_dir, 0o777)
+        self._known_dirs.add(directory_path)
+
+    async def _get_image_metadata(self, path: str) -> dict:
+        """Extract metadata using the shared exiftool daemon for images."""
+        try:
+            return await self.exiftool.get_metadata(path)
+        except Exception as e:
+            self.logger.error(f"Error extracting image metadata: {e}")
+            raise
+
+    async def _get_video_metadata(self, path: str) -> dict:
+        """Extract metadata using ffprobe for videos."""
+        try:
+            async with self._probe_sem:
+                proc = await asyncio.create_subprocess_exec(
+                    "ffprobe",
+                    "-v",
+                    "quiet",
+                    "-print_format",
+                    "json",
+                    "-show_format",
+                    "-show_streams",
+                    path,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                )
+                stdout, stderr = await proc.communicate()
+            if proc.returncode != 0:
+                raise RuntimeError(
+                    f"ffprobe exited with {proc.returncode}: {stderr.decode().strip()}"
+                )
+            return orjson.loads(stdout)
+        except Exception as e:
+            self.logger.error(f"Error extracting video metadata: {e}")
+            raise
+
+    async def _parse_timestamp(self, timestamp_str: str) -> datetime:
+        """Convert a timestamp string to a datetime object."""
+        for format_str in ["%Y:%m:%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S"]:
+            try:
+                return datetime.strptime(timestamp_str.strip(), format_str)
+            except ValueError:
+                pass
+        # If no valid format matches, use current time as fallback
+        self.logger.warning(
+            f"Failed to parse timestamp '{timestamp_str}'. Using current time."
+        )
+        return datetime.now()
+
+    async def _handle_rename(
+        self, existing_path: Path, suffix: str = "_{counter}"
+    ) -> Optional[Path]:
+        """
+        Handle file renaming when a file already exists at the destination.
+
+        Args:
+            existing_path (Path): The path that already exists.
+            suffix (str, optional): Suffix to append to create a unique name. Defaults to "_{counter}".
+
+        Returns:
+            Path | None: The new unique path if successfully renamed, otherwise None.
+        """
+        base_name = existing_path.stem
+        extension = existing_path.suffix
+
+        # The first collision keeps the readable "_1" name; beyond that a
+        # nanosecond timestamp is unique without probing counter after counter
+        for counter in (1, time.time_ns()):
+            # Generate candidate name with suffix
+            candidate_stem = base_name + suffix.format(counter=counter)
+            candidate_path = existing_path.parent / f"{candidate_stem}{extension}"
+
+            if not candidate_path.exists():
+                return candidate_path
+
+        self.logger.error(f"Failed to find a unique name for '{existing_path}'.")
+        return None
+
+    def create_temp_dir(self, prefix: str) -> Path:
+        temp_dir = self.config.paths.ramdisk_dir / prefix
+        temp_dir.mkdir(exist_ok=True)
+        return temp_dir
+
+    def cleanup_temp_dir(self, path: Path):
+        shutil.rmtree(path, ignore_errors=True)
+        self.logger.debug(f"Cleaned up temp directory: {path}")
+
+    async def resize_image(self, path: Path, max_width=1980, with_array=False):
+        """
+        Resizes an image to a specified high resolution.
+
+        The decode/resize/encode work runs in a worker thread so it does not
+        block the event loop; OpenCV releases the GIL while it runs.
+
+        :param path: The path to the input image.
+        :param max_width: The desired high resolution size in pixels, as a tuple of (width, height).
+        :param with_array: Also return the resized pixels as a contiguous RGB uint8 array.
+        :return: The resized image as a bytes object, or a (bytes, ndarray) tuple with with_array.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self.cpu_pool, self._resize_sync, str(path), max_width, with_array
+        )
+
+    def _resize_sync(self, path: str, max_width: int, with_array: bool = False):
+        """Blocking implementation of resize_image, backed by the resize cache."""
+        cache_key = self._resize_cache_key(path, max_width)
+        if cache_key is not None:
+            data = self._resize_cache.get(cache_key)
+            if data is not None:
+                return (data, self._decode_rgb(data)) if with_array else data
+
+        img_bytes, pixels = self._resize_file(path, max_width, with_array)
+        if cache_key is not None:
+            self._store_resized(cache_key, img_bytes)
+        return (img_bytes, pixels) if with_array else img_bytes
+
+    def _resize_cache_key(self, path: str, max_width: int) -> Optional[str]:
+        """Cache key for a resized image, or None if the cache is disabled"""
+        if self._resize_cache is None:
+            return None
+        # Keyed on the file identity and version, not its contents, so a hit
+        # costs one stat instead of reading the original
+        st = os.stat(path)
+        return hashlib.blake2b(
+            f"{st.st_dev}-{st.st_ino}-{st.st_mtime_ns}-{max_width}".encode(),
+            digest_size=16,
+        ).hexdigest()
+
+    def _store_resized(self, cache_key: str, data: bytes):
+        """Write a resized image to the cache"""
+        try:
+            self._resize_cache.put(cache_key, data)
+        except OSError as e:
+            self.logger.warning("Could not cache resized image %s: %s", cache_key, e)
+
+    def _resize_file(
+        self, path: str, max_width: int, with_array: bool = False
+    ) -> Tuple[bytes, Optional[np.ndarray]]:
+        """Decode, downscale and re-encode an image as JPEG (plus RGB pixels if asked)."""
+        if path.lower().endswith(".heic"):
+            return self._resize_heic(path, max_width, with_array)
+
+        # Load the image and resize it to the high resolution
+        img = self._read_image(path, max_width)
+
+        # Get the original width and height of the image
+        # Compute the aspect ratio of the original image
+        orig_height, orig_width = img.shape[:2]
+        if orig_width <= max_width:
+            # Already small enough, only re-encode
+            img_resized = img
+        else:
+            aspect_ratio = orig_width / orig_height
+            target_width = max_width
+            target_height = int(target_width / aspect_ratio)
+            # INTER_AREA is the cheapest good-quality filter for downscaling
+            img_resized = cv2.resize(
+                img, (target_width, target_height), interpolation=cv2.INTER_AREA
+            )
+        resized_height, resized_width = img_resized.shape[:2]
+
+        # Encode the resized image as a JPEG bytes object
+        img_bytes = self._encode_jpeg(img_resized)
+        self.logger.debug(
+            "|Tag Image| Image resized: %s %s x %s",
+            path,
+            resized_height,
+            resized_width,
+        )
+
+        if not with_array:
+            return img_bytes, None
+        return img_bytes, self._to_rgb(img_resized)
+
+    def _resize_heic(
+        self, path: str, max_width: int, with_array: bool = False
+    ) -> Tuple[bytes, Optional[np.ndarray]]:
+        """Resize a HEIC image with pillow-heif, which OpenCV cannot decode."""
+        from PIL import Image
+        from pillow_heif import register_heif_opener
+
+        register_heif_opener()
+        with Image.open(path) as img:
+            img.thumbnail((max_width, max_width * 10), Image.LANCZOS)
+            rgb = img.convert("RGB")
+            buffer = io.BytesIO()
+            rgb.save(buffer, "JPEG", quality=JPEG_QUALITY)
+        self.logger.debug(
+            "|Tag Image| Image resized: %s %s x %s", path, img.height, img.width
+        )
+        return buffer.getvalue(), np.asarray(rgb) if with_array else None
+
+    def _to_rgb(self, img: np.ndarray) -> np.ndarray:
+        """Convert an OpenCV gray/BGR/BGRA array to contiguous RGB."""
+        if img.ndim == 2:
+            return cv2.cvtColor(img, cv2.COLOR_GRAY2RGB)
+        if img.shape[2] == 4:
+            return cv2.cvtColor(img, cv2.COLOR_BGRA2RGB)
+        return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+    def _decode_rgb(self, data: bytes) -> np.ndarray:
+        """Decode JPEG bytes straight to an RGB array."""
+        if _turbo_jpeg:
+            return _turbo_jpeg.decode(data, pixel_format=TJPF_RGB)
+        img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+    def _read_image(self, path: str, max_width: Optional[int] = None):
+        """
+        Decode an image into a BGR array, using libjpeg-turbo for JPEGs.
+
+        libjpeg-turbo can scale while decoding (1/2, 1/4, 1/8, ...), so JPEGs
+        are decoded at the smallest scale that is still at least max_width wide.
+        """
+        if _turbo_jpeg and path.lower().endswith((".jpg", ".jpeg")):
+            with open(path, "rb") as f:
+                data = f.read()
+            scaling_factor = None
+            if max_width:
+                width = _turbo_jpeg.decode_header(data)[0]
+                scaling_factor = self._jpeg_scaling_factor(width, max_width)
+            return _turbo_jpeg.decode(
+                data, pixel_format=TJPF_BGR, scaling_factor=scaling_factor
+            )
+        return cv2.imread(path, cv2.IMREAD_UNCHANGED)
+
+    def _jpeg_scaling_factor(self, width: int, max_width: int):
+        """Smallest libjpeg-turbo scaling factor keeping width >= max_width."""
+        best = None
+        for num, denom in _turbo_jpeg.scaling_factors:
+            scaled_width = -(-width * num // denom)  # libjpeg-turbo rounds up
+            if num <= denom and scaled_width >= max_width:
+                if best is None or num / denom < best[0] / best[1]:
+                    best = (num, denom)
+        return best
+
+    def _encode_jpeg(self, img) -> bytes:
+        """Encode a BGR array as JPEG, using libjpeg-turbo when available."""
+        if _turbo_jpeg and img.ndim == 3 and img.shape[2] == 3:
+            return _turbo_jpeg.encode(img, quality=JPEG_QUALITY, pixel_format=TJPF_BGR)
+        # Grayscale/alpha images and installs without libjpeg-turbo
+        encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), JPEG_QUALITY]
+        _, img_bytes = cv2.imencode(".jpg", img, encode_param)
+        return img_bytes.tobytes()
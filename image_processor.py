@@ -5,7 +5,7 @@
 # - Image Tagging using Clarifai API
 # - OCR (Optical Character Recognition) with PaddleOCR
 # - Face Recognition & Classification
-# - Color Analysis using K-means clustering
+# - Color Analysis using a Lab-space palette histogram
 # - Geotagging via Reverse Geocoding API
 
 
@@ -24,22 +24,22 @@
 
 from typing import Tuple
 
-import json
+import asyncio
+import os
+import time
+import orjson
 import webcolors
 import numpy as np
 import face_recognition
 from pathlib import Path
 from typing import List, Dict, Optional
-from PIL import Image
-from sklearn import svm
-from sklearn.cluster import KMeans
+from concurrent.futures import Executor
 import pickle
 import io
 from metadata_service import MetadataService
 from api_client import APIClient
-from file_mananger import FileManager
+from file_manager import FileManager
 import requests
-from stop_timer import StopTimer
 
 
 from clarifai_grpc.channel.clarifai_channel import ClarifaiChannel
@@ -49,7 +49,13 @@ from clarifai_grpc.grpc.api.status import status_code_pb2
 import logging
 from log_service import setup_logging
 from paddleocr import PaddleOCR
-from libs.color_service import color_names_rgb, _create_color_mapping
+from libs.color_service import (
+    color_names_rgb,
+    _create_color_mapping,
+    nearest_palette,
+    rgb_to_lab,
+)
+from libs.batch_queue import AsyncBatchQueue
 
 
 class ImageProcessor:
@@ -59,8 +65,11 @@ class ImageProcessor:
         metadata: MetadataService,
         api: APIClient,
         file_manager: FileManager,
+        cpu_pool: Optional[Executor] = None,
     ):
         self.config = config
+        # Executor for CPU-bound stages; None uses the loop's default executor
+        self.cpu_pool = cpu_pool
         self.metadata = metadata
         self.api = api
         self.file_manager = file_manager
@@ -72,164 +81,230 @@ class ImageProcessor:
         self.color_names_rgb = color_names_rgb
         self._create_color_mapping = _create_color_mapping
         self.color_map = self._create_color_mapping()
+        # Palette as an (N, 3) Lab matrix so nearest-color lookups are one kernel call
+        self._palette_names = list(self.color_names_rgb.keys())
+        self._palette_lab = rgb_to_lab(
+            np.asarray(list(self.color_names_rgb.values()), dtype=np.float32)
+        )
+        if self.config.workflow.images.enable_color_analysis:
+            # Compile (or load from cache) the numba kernel now, not on the first image
+            nearest_palette(self._palette_lab[:1], self._palette_lab)
         if self.config.workflow.images.enable_ocr:
             # Initialize PaddleOCR with English language support and angle classification
+            # rec_batch_num=1 keeps Paddle's CPU arena small; batching the
+            # recognizer does not parallelize on CPU anyway
             self.ocr = PaddleOCR(
-                use_angle_cls=True, lang="en", use_gpu=False
-            )  # Force CPU
+                use_angle_cls=True,
+                lang="en",
+                use_gpu=False,  # Force CPU
+                rec_batch_num=1,
+                enable_mkldnn=True,
+                cpu_threads=os.cpu_count(),
+            )
+            # Concurrent OCR requests share one PaddleOCR call per batch
+            self._ocr_queue = AsyncBatchQueue(
+                self._ocr_batch, max_batch_size=8, max_wait_time=0.1
+            )
 
-        if self.config.workflow.images.enable_face_recognition:
-            # Initialize PaddleOCR with English language support and angle classification
-            self.classifier = self._get_face_classifier()
+        if self.config.workflow.images.enable_tagging:
+            # One gRPC channel and stub for the lifetime of the processor
+            self._clarifai_stub = service_pb2_grpc.V2Stub(
+                ClarifaiChannel.get_grpc_channel()
+            )
+            self._clarifai_metadata = (
+                ("authorization", f"Key {self.config.api.CLARIFAI_API_KEY}"),
+            )
+            # Concurrent tagging requests share one Clarifai round trip
+            self._tag_queue = AsyncBatchQueue(
+                self._tag_batch, max_batch_size=16, max_wait_time=0.25
+            )
+
+        # Face classifier, loaded (or trained) on first use
+        self._face_clf = None
 
         self.logger.info(
             "Image Processor initialized with configuration: %s", self.config
         )
 
-    async def process(self, image_path: Path) -> Dict:
-        """Full image processing pipeline"""
-        timer = StopTimer()
+    async def _run_cpu(self, func, *args):
+        """Run a blocking, CPU-bound call in the CPU pool"""
+        return await asyncio.get_running_loop().run_in_executor(
+            self.cpu_pool, func, *args
+        )
 
-        # Start timing
-        timer.start()
+    async def process(
+        self, image_path: Path, st: Optional[os.stat_result] = None
+    ) -> Dict:
+        """Full image processing pipeline; `st` is the file's stat when already known"""
+        t0 = time.perf_counter()
         results = {}
         self.logger.info("-------------------------------------------------")
         self.logger.info("Started processing image %s", image_path)
 
         try:
-            # Core processing steps
-            if self.config.workflow.images.enable_tagging:
-                self.logger.info(f"Generating tags (enable_tagging)")
-                results["tags"] = await self._get_image_tags(image_path)
-                self.logger.debug(f"Tags: {results['tags']}")
-
-            if self.config.workflow.images.enable_geotagging:
-                self.logger.info(f"Reverse geotagging (enable_geotagging)")
-                results["geotag"] = await self._process_geotagging(image_path)
-                self.logger.debug(f"Geotag: {results['geotag']}")
-
-            if self.config.workflow.images.enable_description:
-                self.logger.info(f"Creating a description (enable_description)")
-                results["description"] = await self._process_description(image_path)
-                self.logger.debug(f"Description: {results['description']}")
-
-            if self.config.workflow.images.enable_color_analysis:
-                self.logger.info(f"Analyzing colors (enable_color_analysis)")
-                results["colors"] = await self._process_analyze_colors(image_path)
-                self.logger.debug(f"Dominat colors: {results['colors']}")
+            # Core processing steps. They are independent, so run them
+            # concurrently: the network-bound stages (Clarifai, OpenCage,
+            # Replicate) overlap with the local face/color/OCR work
+            images = self.config.workflow.images
+
+            # Decode and resize once; tagging, description and color analysis
+            # all work from the same downscaled copy
+            resized_image = resized_pixels = None
+            if images.enable_color_analysis:
+                # Color analysis also needs the decoded pixels
+                resized_image, resized_pixels = await self.file_manager.resize_image(
+                    image_path, max_width=1920, with_array=True
+                )
+            elif images.enable_tagging or images.enable_description:
+                resized_image = await self.file_manager.resize_image(
+                    image_path, max_width=1920
+                )
+
+            # Read the file's metadata once; geotagging and the metadata
+            # write both work from it
+            existing_metadata = None
+            if images.enable_geotagging or images.write_metadata:
+                existing_metadata = await self.metadata.read_metadata(image_path)
+
+            stages = {}
+            if images.enable_tagging:
+                self.logger.info("Generating tags (enable_tagging)")
+                stages["tags"] = self._get_image_tags(image_path, resized_image)
+
+            if images.enable_geotagging:
+                self.logger.info("Reverse geotagging (enable_geotagging)")
+                stages["geotag"] = self._process_geotagging(
+                    image_path, existing_metadata
+                )
+
+            if images.enable_description:
+                self.logger.info("Creating a description (enable_description)")
+                stages["description"] = self._process_description(
+                    image_path, resized_image
+                )
+
+            if images.enable_color_analysis:
+                self.logger.info("Analyzing colors (enable_color_analysis)")
+                stages["colors"] = self._process_analyze_colors(resized_pixels)
 
             # if self.config.processing.detect_objects:
-            #     results["objects"] = await self._detect_objects(image_path)
+            #     stages["objects"] = self._detect_objects(image_path)
 
-            if self.config.workflow.images.enable_face_recognition:
-                self.logger.info(f"Recognizing faces (enable_face_recognition)")
-                results["faces"] = await self._classify_faces(image_path)
-                self.logger.debug(f"Faces: {results['faces']}")
+            if images.enable_face_recognition:
+                self.logger.info("Recognizing faces (enable_face_recognition)")
+                stages["faces"] = self._classify_faces(image_path)
 
             # if self.config.processing.generate_captions:
-            #     results["caption"] = await self._generate_caption(image_path)
+            #     stages["caption"] = self._generate_caption(image_path)
 
-            if self.config.workflow.images.enable_ocr:
-                self.logger.info(f"Performing OCR (enable_ocr)")
-                results["ocr"] = await self._process_ocr(image_path)
-                self.logger.info(f"OCR: {results['ocr']}")
+            if images.enable_ocr:
+                self.logger.info("Performing OCR (enable_ocr)")
+                stages["ocr"] = self._process_ocr(image_path)
 
             # if self.config.processing.rate_image:
-            #     results["rate"] = await self._rate_image(image_path)
+            #     stages["rate"] = self._rate_image(image_path)
+
+            outputs = await asyncio.gather(*stages.values(), return_exceptions=True)
+            for key, output in zip(stages, outputs):
+                # A failing stage only drops its own result
+                if isinstance(output, BaseException):
+                    self.logger.error(
+                        "Stage '%s' failed for %s: %s", key, image_path, output
+                    )
+                    continue
+                results[key] = output
+                self.logger.debug("%s: %s", key, output)
 
             # Write metadata
             if self.config.workflow.images.write_metadata and len(results):
-                self.logger.info(f"Writing metadta (write_metadata)")
-                await self.metadata.write_metadata(image_path, results, "image")
+                self.logger.info("Writing metadta (write_metadata)")
+                await self.metadata.write_metadata(
+                    image_path, results, "image", existing_metadata=existing_metadata
+                )
             if (
                 self.config.workflow.images.move_processed_media
                 or self.config.workflow.videos.move_processed_media
             ) and not self.config.processing.simulate_processing:
-                self.logger.info(f"Moving file (move_processed_media)")
+                self.logger.info("Moving file (move_processed_media)")
                 destination = await self.file_manager.organize_file(
                     path=image_path,
                     conflict_resolution=self.config.processing.conflict_resolution,
                     rename_suffix=self.config.processing.rename_suffix,
+                    st=st,
                 )
-                self.logger.info(f"File moved to: '{destination}'")
+                self.logger.info("File moved to: '%s'", destination)
 
         except Exception as e:
-            self.logger.error(f"Image processing failed for: {image_path}: {str(e)}")
+            self.logger.error("Image processing failed for: %s: %s", image_path, e)
             return {}
-        # Stop timing after processing
-        timer.stop()
-
-        # Log the duration
         self.logger.info(
             "Finished processing image %s with results: %s", image_path, results
         )
         self.logger.info(
-            "Time taken to process image %s: %s seconds", image_path, timer.duration()
+            "Time taken to process image %s: %.3f seconds",
+            image_path,
+            time.perf_counter() - t0,
         )
-
-        # Reset the timer for next usage
-        timer.reset()
         return results
 
-    async def _process_description(self, image_path: Path) -> List[str]:
+    async def _process_description(
+        self, image_path: Path, resized_image: bytes
+    ) -> List[str]:
         import replicate
 
         prompt = self.config.processing.image_description_prompt
 
-        # Step 1: Resize the image
-        try:
-            resized_image = await self.file_manager.resize_image(
-                image_path, max_width=1920
+        def describe() -> str:
+            o = replicate.run(
+                self.config.processing.replicate_model,
+                input={
+                    "prompt": prompt,
+                    # ✅ Wrap bytes into a file-like object
+                    "image": io.BytesIO(resized_image),
+                },
             )
+            # The yorickvp/llava-13b model can stream output as it's running.
+            # The predict method returns an iterator, and you can iterate over that output.
+            output = ""
+            for item in o:
+                # https://replicate.com/yorickvp/llava-13b/versions/e272157381e2a3bf12df3a8edd1f38d1dbd736bbb7437277c8b34175f8fce358/api#output-schema
+                # print(item, end="")
+                output = output + item
+            return output
+
+        # The client and its streamed output are blocking; a thread rather than
+        # the CPU pool, since it mostly waits on the network
+        return await asyncio.to_thread(describe)
+
+    async def _get_image_tags(
+        self, image_path: Path, resized_image: bytes
+    ) -> List[str]:
+        """Get image tags using Clarifai API"""
 
-            self.logger.debug(resized_image[:300])
-            resized_image = io.BytesIO(
-                resized_image
-            )  # ✅ Wrap bytes into a file-like object
-        except Exception as e:
-            error_message = (
-                f"An exception occurred while resizing the image {image_path}: {str(e)}"
+        # Sent together with other pending images in one PostModelOutputs call
+        tagNames = await (await self._tag_queue.add_request(resized_image))
+        if tagNames:
+            self.logger.debug(
+                "|Tag Image| %d tags generated: %s", len(tagNames), tagNames
             )
-            self.logger.error(error_message)
-            return
-
-        o = replicate.run(
-            self.config.processing.replicate_model,
-            input={
-                "prompt": prompt,
-                "image": resized_image,
-            },
-        )
-        # The yorickvp/llava-13b model can stream output as it's running.
-        # The predict method returns an iterator, and you can iterate over that output.
-        output = ""
-        for item in o:
-            # https://replicate.com/yorickvp/llava-13b/versions/e272157381e2a3bf12df3a8edd1f38d1dbd736bbb7437277c8b34175f8fce358/api#output-schema
-            # print(item, end="")
-            output = output + item
-        return output
-
-    async def _get_image_tags(self, image_path: Path) -> List[str]:
-        """Get image tags using Clarifai API"""
+        self.logger.debug("Tags generated for image %s: %s", image_path, tagNames)
 
-        resized_image = await self.file_manager.resize_image(image_path, max_width=1920)
-        channel = ClarifaiChannel.get_json_channel()
-        stub = service_pb2_grpc.V2Stub(ClarifaiChannel.get_grpc_channel())
-        # This is how you authenticate.
-        metadata = (("authorization", f"Key {self.config.api.CLARIFAI_API_KEY}"),)
-        app_id = self.config.api.CLARIFAI_APP_ID
+        return tagNames
 
-        post_model_outputs_response = stub.PostModelOutputs(
+    def _tag_batch(self, images: List[bytes]) -> List:
+        """Tag a batch of images in one Clarifai request (called from a worker thread)"""
+        post_model_outputs_response = self._clarifai_stub.PostModelOutputs(
             service_pb2.PostModelOutputsRequest(
                 model_id="general-image-recognition",
                 # model_id="aaa03c23b3724a16a56b629203edc62c",
-                user_app_id=resources_pb2.UserAppIDSet(app_id=app_id),
+                user_app_id=resources_pb2.UserAppIDSet(
+                    app_id=self.config.api.CLARIFAI_APP_ID
+                ),
                 inputs=[
                     resources_pb2.Input(
-                        data=resources_pb2.Data(
-                            image=resources_pb2.Image(base64=resized_image)
-                        )
+                        data=resources_pb2.Data(image=resources_pb2.Image(base64=image))
                     )
+                    for image in images
                 ],
                 model=resources_pb2.Model(
                     output_info=resources_pb2.OutputInfo(
@@ -239,31 +314,32 @@ class ImageProcessor:
                     )
                 ),
             ),
-            metadata=metadata,
+            metadata=self._clarifai_metadata,
         )
 
-        if post_model_outputs_response.status.code != status_code_pb2.SUCCESS:
+        # MIXED_STATUS means some inputs failed; those are reported per output
+        if post_model_outputs_response.status.code not in (
+            status_code_pb2.SUCCESS,
+            status_code_pb2.MIXED_STATUS,
+        ):
             raise Exception(
                 "Post model outputs failed, status: "
                 + post_model_outputs_response.status.description
             )
 
-        # Since we have one input, one output will exist here.
-        output = post_model_outputs_response.outputs[0]
-        tags = ""
-        tagNames = []
-        tagCount = 0
-        # self.logger.debug("Predicted concepts:")
-        for concept in output.data.concepts:
-            tagCount += 1
-            tagNames.append(concept.name)
-        if len(tagNames) > 0:
-            self.logger.debug(
-                f"|Tag Image| {tagCount} tags generated: " + str(tagNames)
-            )
-        self.logger.debug("Tags generated for image %s: %s", image_path, tagNames)
-
-        return tagNames
+        # Outputs come back in input order
+        results = []
+        for output in post_model_outputs_response.outputs:
+            if output.status.code != status_code_pb2.SUCCESS:
+                results.append(
+                    Exception(
+                        "Post model outputs failed, status: "
+                        + output.status.description
+                    )
+                )
+            else:
+                results.append([concept.name for concept in output.data.concepts])
+        return results
 
     async def _generate_caption(self, image_path: Path) -> Optional[str]:
         """Generate image caption using AI service"""
@@ -307,44 +383,67 @@ class ImageProcessor:
         try:
             result = []
 
-            # Perform OCR on the image
-            ocr_output = self.ocr.ocr(str(image_path))
-            self.logger.debug(f"|OCR Image| successful: {str(ocr_output)}")
+            # Perform OCR on the image, batched with other pending requests
+            ocr_output = await (await self._ocr_queue.add_request(str(image_path)))
+            self.logger.debug("|OCR Image| successful: %s", ocr_output)
 
             if ocr_output and ocr_output[0]:  # Check if OCR produced any results
                 result = await self.process_ocr_output(ocr_output)
             else:
                 self.logger.debug(
-                    f"|OCR Image| No text detected in image: {image_path}"
+                    "|OCR Image| No text detected in image: %s", image_path
                 )
                 result = ""  # Or return an empty list if you prefer
 
             return result
         except Exception as e:
-            self.logger.error(f"|OCR Image| Error during OCR: {str(e)}")
+            self.logger.error("|OCR Image| Error during OCR: %s", e)
             # Here you might want to return an empty list, or some error string
             return ["Error in OCR processing"]
 
-        except Exception as e:
-            self.logger.error(f"OCR processing failed: {str(e)}")
-            return ""
+    def _ocr_batch(self, image_paths: List[str]) -> List:
+        """Run PaddleOCR over a batch of images (called from a worker thread)"""
+        outputs = []
+        for path in image_paths:
+            try:
+                outputs.append(self.ocr.ocr(path))
+            except Exception as e:
+                # Fail only this image, not the whole batch
+                outputs.append(e)
+        return outputs
 
     async def _classify_faces(self, image_path: Path) -> List[str]:
         """Face recognition and classification"""
         try:
-            # Load or train classifier. MOved to the init of the module so it is loaded only once
-            # classifier = await self._get_face_classifier()
+            # Load or train classifier. Cached after the first call so it is loaded only once
+            classifier = await self._get_face_classifier()
 
-            # Process image
-            image = face_recognition.load_image_file(image_path)
-            face_encodings = face_recognition.face_encodings(image)
+            # Process image; decoding and the dlib model are CPU-bound, keep
+            # them off the event loop
+            image = await self._run_cpu(face_recognition.load_image_file, image_path)
+            face_encodings = await self._run_cpu(face_recognition.face_encodings, image)
 
             if not face_encodings:
 
                 return [self.config.processing.no_face_tag]
 
-            # Predict faces
-            predictions = classifier.predict(face_encodings)
+            # Match each face to the nearest person centroid (cosine similarity
+            # of unit vectors); faces too far from every centroid are unknown
+            encodings = np.asarray(face_encodings, dtype=np.float32)
+            encodings /= np.linalg.norm(encodings, axis=1, keepdims=True)
+            scores = encodings @ classifier["centroids"].astype(np.float32).T
+            best = scores.argmax(axis=1)
+            # For unit vectors ||x - c|| = sqrt(2 - 2 cos)
+            distances = np.sqrt(np.maximum(2.0 - 2.0 * scores.max(axis=1), 0.0))
+            threshold = self.config.processing.face_distance_threshold
+            predictions = [
+                (
+                    classifier["names"][i]
+                    if d <= threshold
+                    else self.config.processing.unknown_face_tag
+                )
+                for i, d in zip(best, distances)
+            ]
             self.logger.debug(
                 "Detected faces for image %s: %s", image_path, predictions
             )
@@ -352,11 +451,14 @@ class ImageProcessor:
             return list(set(predictions))
 
         except Exception as e:
-            self.logger.error(f"Face classification failed: {str(e)}")
+            self.logger.error("Face classification failed: %s", e)
             return []
 
     async def _get_face_classifier(self):
         """Load or train face classifier"""
+        if self._face_clf is not None:
+            return self._face_clf
+
         if not self.config.paths.face_classifier.exists():
             self.logger.warning(
                 f"No face classifier found in: {str(self.config.paths.face_classifier)} training a new one."
@@ -365,100 +467,87 @@ class ImageProcessor:
             await self._train_face_classifier()
 
         with open(self.config.paths.face_classifier, "rb") as f:
-            return pickle.load(f)
+            classifier = pickle.load(f)
+
+        if not isinstance(classifier, dict) or "centroids" not in classifier:
+            # Pickles from the SVC-based versions cannot be used anymore
+            self.logger.warning(
+                "Face classifier %s has an outdated format, retraining",
+                self.config.paths.face_classifier,
+            )
+            await self._train_face_classifier()
+            with open(self.config.paths.face_classifier, "rb") as f:
+                classifier = pickle.load(f)
+
+        self._face_clf = classifier
+        return self._face_clf
 
     async def _train_face_classifier(self):
-        """Train new face classifier model"""
-        encodings = []
-        names = []
+        """Train new face classifier model: one unit-length centroid per person"""
+        groups = {}
 
         for person_dir in self.config.paths.known_faces_dir.iterdir():
             if not person_dir.is_dir():
                 continue
 
             for image_file in person_dir.glob("*"):
-                image = face_recognition.load_image_file(image_file)
-                face_encodings = face_recognition.face_encodings(image)
+                image = await self._run_cpu(
+                    face_recognition.load_image_file, image_file
+                )
+                face_encodings = await self._run_cpu(
+                    face_recognition.face_encodings, image
+                )
 
                 if len(face_encodings) == 1:
-                    encodings.append(face_encodings[0])
-                    names.append(person_dir.name)
+                    groups.setdefault(person_dir.name, []).append(face_encodings[0])
 
-        classifier = svm.SVC(gamma="scale")
-        classifier.fit(encodings, names)
+        if not groups:
+            raise ValueError(
+                f"No usable faces found in {self.config.paths.known_faces_dir}"
+            )
+
+        names = list(groups)
+        centroids = np.stack([np.mean(groups[name], axis=0) for name in names])
+        centroids /= np.linalg.norm(centroids, axis=1, keepdims=True)
+        classifier = {"names": names, "centroids": centroids.astype(np.float16)}
 
         with open(self.config.paths.face_classifier, "wb") as f:
             pickle.dump(classifier, f)
 
-    async def closest_color(self, rgb: np.ndarray) -> str:
-        # Function to calculate the Euclidean distance between two colors
-        def euclidean_distance(c1, c2):
-            return np.sqrt(np.sum((np.array(c1) - np.array(c2)) ** 2))
-
-        closest_color = None
-        min_distance = float("inf")
-
-        # Iterate through the color names and find the closest match
-        for color_name, color_rgb in self.color_names_rgb.items():
-            distance = euclidean_distance(rgb, color_rgb)
-            if distance < min_distance:
-                min_distance = distance
-                closest_color = color_name
+    async def _process_analyze_colors(self, resized_pixels: np.ndarray) -> List[str]:
+        """Analyze dominant colors of an already resized (H, W, 3) RGB array"""
+        return await self._run_cpu(self._dominant_colors, resized_pixels)
 
-        return closest_color
+    def _dominant_colors(self, resized_pixels: np.ndarray) -> List[str]:
+        """Blocking implementation of _process_analyze_colors"""
 
-    async def _process_analyze_colors(self, image_path: Path) -> List[str]:
-        """Analyze dominant colors in image"""
-
-        resized_image = await self.file_manager.resize_image(image_path, max_width=1920)
-        resized_image = Image.open(
-            io.BytesIO(resized_image)
-        )  # ✅ Wrap bytes into a file-like object
-
-        pixels = np.array(resized_image)
-        # self.logger.debug(resized_image[:300])
-        # self.logger.debug(pixels[:300])
+        pixels = resized_pixels.reshape(-1, 3)
         if pixels.size == 0:
             raise ValueError("Empty or corrupt image file")
-        # Ensure it's in the expected shape (height, width, channels)
-        if len(pixels.shape) != 3:
-            raise ValueError(f"Unexpected image shape: {pixels.shape}")
-
-        # Handle alpha channel
-        if pixels.shape[-1] == 4:
-            pixels = pixels[..., :3]
-
-        pixels = pixels.reshape(-1, 3)
-        # Apply K-means clustering to find the dominant colors
-        k = 4
-        n = 5
-        kmeans = KMeans(n_clusters=k, n_init="auto").fit(pixels)
-        # Get the colors of the cluster centers
-        colors = kmeans.cluster_centers_
-        # Get the count of pixels assigned to each cluster
-        labels, counts = np.unique(kmeans.labels_, return_counts=True)
-        # Sort the colors by frequency
-        sorted_colors = colors[np.argsort(-counts)]
-        # Convert the color values to integers and map to color names
-
-        color_names = [
-            await self.closest_color(np.round(color).astype(int))
-            for color in sorted_colors
-        ]
-        # print(sorted_colors)
-
-        # Return the top n colors
-        top_colors = color_names[:n]
-        simpleColors = []
 
-        try:
-            for color in top_colors:
-                simpleColors.append(self.COLORS[color])
-        except:
-            pass
-        top_colors += simpleColors
-        top_colors = list(set(top_colors))
-        self.logger.debug("|Top Colors|: " + str(top_colors))
+        # The result is a set of palette names anyway, so histogram the pixels
+        # straight into the palette (nearest entry in Lab space) instead of
+        # clustering them first. Large images are uniformly subsampled.
+        sample_size = self.config.processing.color_sample_size
+        if len(pixels) > sample_size:
+            pixels = pixels[
+                np.random.default_rng(0).choice(len(pixels), sample_size, replace=False)
+            ]
+        idx = nearest_palette(rgb_to_lab(pixels), self._palette_lab)
+        counts = np.bincount(idx, minlength=len(self._palette_names))
+
+        # Top n palette entries by pixel count, most dominant first
+        n = min(self.config.processing.colors_to_detect, np.count_nonzero(counts))
+        top = np.argpartition(-counts, n - 1)[:n]
+        top = top[np.argsort(-counts[top])]
+        top_colors = [self._palette_names[i] for i in top]
+        # Add the simplified name of each color ("navy" -> "blue"), keeping
+        # the dominance order and dropping duplicates
+        simple_colors = [
+            self.color_map[color] for color in top_colors if color in self.color_map
+        ]
+        top_colors = list(dict.fromkeys(top_colors + simple_colors))
+        self.logger.debug("|Top Colors|: %s", top_colors)
 
         return top_colors
 
@@ -512,9 +601,11 @@ class ImageProcessor:
             self.logger.error(f"Geotagging failed for {image_path}: {str(e)}")
             return {}
 
-    async def _process_geotagging(self, image_path: Path) -> Dict:
+    async def _process_geotagging(
+        self, image_path: Path, metadata: Optional[Dict] = None
+    ) -> Dict:
         """Handle reverse geocoding"""
-        gps_data = await self.metadata.get_gps_coordinates(image_path)
+        gps_data = await self.metadata.get_gps_coordinates(image_path, metadata)
         if not gps_data:
             self.logger.warning("No GPS data found for image %s", image_path)
 
@@ -578,7 +669,7 @@ class ImageProcessor:
         response = requests.post(
             fm_config.IMAGE_RATING_URL,
             headers=fm_config.IMAGE_RATING_HEADERS,
-            data=json.dumps(payload),
+            data=orjson.dumps(payload),
         )
 
         # Check the response
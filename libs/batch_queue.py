@@ -0,0 +1,70 @@
+# batch_queue
+# Groups concurrent requests into batches so a blocking model (e.g. PaddleOCR) is
+# invoked once per batch instead of once per item.
+import asyncio
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+
+class AsyncBatchQueue:
+    """Collect requests until `max_batch_size` are queued or `max_wait_time` elapses.
+
+    `process_fn` receives the list of queued items and must return one result per
+    item, in order. It runs in a worker thread and batches are processed one at a
+    time. A result that is an exception is raised to that item's caller only.
+    """
+
+    def __init__(
+        self,
+        process_fn: Callable[[List[Any]], Sequence[Any]],
+        max_batch_size: int = 8,
+        max_wait_time: float = 0.1,
+    ):
+        self.process_fn = process_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_time = max_wait_time
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._lock = asyncio.Lock()
+        self._tasks = set()
+
+    async def add_request(self, item: Any) -> asyncio.Future:
+        """Queue `item` and return a future resolving to its result"""
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((item, fut))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_time, self._flush)
+        return fut
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._run(batch))
+        # Keep a reference so the task is not garbage collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]):
+        items = [item for item, _ in batch]
+        try:
+            async with self._lock:
+                results = await asyncio.to_thread(self.process_fn, items)
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        for (_, fut), result in zip(batch, results):
+            if fut.done():
+                continue
+            if isinstance(result, BaseException):
+                fut.set_exception(result)
+            else:
+                fut.set_result(result)
@@ -1,5 +1,12 @@
 # color_names_rgb
 # Define some basic CSS color names and their corresponding RGB values
+import numpy as np
+
+try:
+    # Optional: a compiled, multi-threaded nearest-palette kernel
+    from numba import njit, prange
+except ImportError:
+    njit = None
 color_names_rgb = {
     "red": [255, 0, 0],
     "green": [0, 255, 0],
@@ -215,3 +222,76 @@ def _create_color_mapping():
         "yellow": "yellow",
         "yellowgreen": "green",
     }
+
+
+# sRGB (D65) -> CIE XYZ
+_RGB_TO_XYZ = np.array(
+    [
+        [0.4124564, 0.3575761, 0.1804375],
+        [0.2126729, 0.7151522, 0.0721750],
+        [0.0193339, 0.1191920, 0.9503041],
+    ],
+    dtype=np.float32,
+)
+_D65_WHITE = np.array([0.95047, 1.0, 1.08883], dtype=np.float32)
+
+
+def rgb_to_lab(rgb: np.ndarray) -> np.ndarray:
+    """Convert an (N, 3) array of 0-255 sRGB values to CIE Lab (float32)"""
+    c = np.asarray(rgb, dtype=np.float32) / 255.0
+    # Undo the sRGB gamma curve
+    linear = np.where(c > 0.04045, ((c + 0.055) / 1.055) ** 2.4, c / 12.92)
+    xyz = (linear @ _RGB_TO_XYZ.T) / _D65_WHITE
+    f = np.where(xyz > 216 / 24389, np.cbrt(xyz), (24389 / 27 * xyz + 16) / 116)
+    lab = np.empty_like(f)
+    lab[:, 0] = 116 * f[:, 1] - 16
+    lab[:, 1] = 500 * (f[:, 0] - f[:, 1])
+    lab[:, 2] = 200 * (f[:, 1] - f[:, 2])
+    return lab
+
+
+if njit is not None:
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _nearest_palette_numba(pix, pal, out):
+        for i in prange(pix.shape[0]):
+            best = 0
+            best_d = np.inf
+            for j in range(pal.shape[0]):
+                d0 = pix[i, 0] - pal[j, 0]
+                d1 = pix[i, 1] - pal[j, 1]
+                d2 = pix[i, 2] - pal[j, 2]
+                d = d0 * d0 + d1 * d1 + d2 * d2
+                if d < best_d:
+                    best_d = d
+                    best = j
+            out[i] = best
+
+
+def nearest_palette(
+    lab: np.ndarray, palette_lab: np.ndarray, chunk_size: int = 65536
+) -> np.ndarray:
+    """Index of the nearest palette entry for each row (squared Euclidean)
+
+    Works for any 3-channel space; callers pass Lab or RGB rows matching the palette.
+    """
+    out = np.empty(len(lab), dtype=np.intp)
+    if njit is not None:
+        _nearest_palette_numba(
+            np.ascontiguousarray(lab, dtype=np.float32),
+            np.ascontiguousarray(palette_lab, dtype=np.float32),
+            out,
+        )
+        return out
+
+    # ||p - c||^2 = ||p||^2 - 2 p.c + ||c||^2; ||p||^2 is constant per row, so
+    # the argmin only needs a matrix product. Chunks bound the (rows, palette)
+    # distance matrix to a few MB.
+    palette_t = np.ascontiguousarray(palette_lab.T, dtype=np.float32)
+    palette_sq = (palette_t**2).sum(axis=0)
+    for start in range(0, len(lab), chunk_size):
+        block = lab[start : start + chunk_size]
+        out[start : start + len(block)] = (palette_sq - 2 * block @ palette_t).argmin(
+            axis=1
+        )
+    return out
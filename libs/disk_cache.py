@@ -0,0 +1,76 @@
+# disk_cache
+# Size-bounded cache of files in one directory, usually under ramdisk_dir. Once the entries
+# grow past the limit, the least recently used ones are deleted. Blocking: async callers run
+# it in a thread.
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+
+class DiskCache:
+    def __init__(self, directory: Path, max_bytes: int, suffix: str):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        # Bytes held by the entries, counted on the first write
+        self._bytes: Optional[int] = None
+
+    def path(self, key: str) -> Path:
+        return self.directory / f"{key}{self.suffix}"
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Contents of an entry, or None on a miss"""
+        path = self.path(key)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        try:
+            # Touch it so eviction drops the least recently used entries
+            os.utime(path)
+        except FileNotFoundError:
+            pass  # Evicted in the meantime
+        return data
+
+    def put(self, key: str, data: bytes):
+        """Write an entry and evict old entries once the cache is full; raises OSError"""
+        path = self.path(key)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = sum(size for _, size, _ in self._entries())
+            else:
+                self._bytes += len(data)
+            if self._bytes > self.max_bytes:
+                self._evict(int(self.max_bytes * 0.9))
+
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(self.suffix):
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime_ns, st.st_size, entry.path))
+        return entries
+
+    def _evict(self, target: int):
+        """Delete least recently used entries until at most target bytes remain"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(entry_path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._bytes = total
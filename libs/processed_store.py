@@ -0,0 +1,64 @@
+# processed_store
+# Remembers which files were processed, keyed by (path, mtime_ns): a file that is modified
+# afterwards is picked up again. Backed by SQLite when a path is given so the state survives
+# restarts; otherwise kept in memory.
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional
+
+
+class ProcessedStore:
+    def __init__(self, db_path: Optional[Path] = None, commit_every: int = 50):
+        self.commit_every = commit_every
+        self._lock = threading.Lock()
+        self._memory: dict[str, int] = {}
+        self._db = None
+        self._pending = 0
+        if db_path is not None:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            # Autocommit mode; writes are grouped in explicit transactions below
+            self._db = sqlite3.connect(
+                str(db_path), isolation_level=None, check_same_thread=False
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS seen (path TEXT PRIMARY KEY, mtime INTEGER)"
+            )
+
+    def seen(self, path: str, mtime_ns: int) -> bool:
+        """True if this version of the file was already processed"""
+        with self._lock:
+            if self._db is None:
+                return self._memory.get(path) == mtime_ns
+            row = self._db.execute(
+                "SELECT mtime FROM seen WHERE path = ?", (path,)
+            ).fetchone()
+            return row is not None and row[0] == mtime_ns
+
+    def mark(self, path: str, mtime_ns: int):
+        """Record a processed file; commits every `commit_every` marks"""
+        with self._lock:
+            if self._db is None:
+                self._memory[path] = mtime_ns
+                return
+            if not self._db.in_transaction:
+                self._db.execute("BEGIN")
+            self._db.execute(
+                "INSERT OR REPLACE INTO seen (path, mtime) VALUES (?, ?)",
+                (path, mtime_ns),
+            )
+            self._pending += 1
+            if self._pending >= self.commit_every:
+                self._commit()
+
+    def _commit(self):
+        if self._db.in_transaction:
+            self._db.execute("COMMIT")
+        self._pending = 0
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._commit()
+                self._db.close()
+                self._db = None
@@ -11,8 +11,15 @@ import logging
 from pathlib import Path
 from config import AppConfig
 
+# Set once the handlers are installed; later calls are no-ops
+_configured = False
+
 
 def setup_logging(config: AppConfig):
+    global _configured
+    if _configured:
+        return
+
     logger = logging.getLogger()  # Get the root logger
     logger.setLevel(config.logging.level.upper())  # Set global log level
 
@@ -42,3 +49,4 @@ def setup_logging(config: AppConfig):
 
     logging.getLogger("httpx").setLevel(logging.WARNING)
     logging.getLogger("ppocr").setLevel(logging.WARNING)
+    _configured = True
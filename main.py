@@ -15,13 +15,13 @@ from config import (
 )
 from media_controller import MediaController
 from config import AppConfig
-from file_mananger import FileManager
+from file_manager import FileManager
 
 # from image_processor import ImageProcessor
 # from video_processor import VideoProcessor
 from task_runner import TaskRunner
 from metadata_service import MetadataService
-from api_client import APIClient
+from api_client import get_api_client
 
 from pathlib import Path
 import asyncio
@@ -141,7 +141,7 @@ print("Image Extension:", config.image_extensions)
 
 # Initialize dependencies
 metadata = MetadataService(config)
-api = APIClient(config)
+api = get_api_client(config)
 file_manager = FileManager(config)
 # image_processor = ImageProcessor(config)
 task_runner = TaskRunner(config, 1)
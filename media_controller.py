@@ -3,15 +3,20 @@
 # The `MediaController` class serves as the central orchestrator for managing media files 
 # and coordinating their processing through various services and processors.
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import time
+from typing import AsyncIterator, Optional
 
 from config import AppConfig
-from file_mananger import FileManager
+from directory_watcher import DirectoryWatcher
+from file_manager import FileManager
 from task_runner import TaskRunner
 from metadata_service import MetadataService
-from api_client import APIClient
+from api_client import get_api_client
+from exiftool_daemon import get_exiftool
 from image_processor import ImageProcessor
+from libs.processed_store import ProcessedStore
 import logging
 from log_service import setup_logging
 import os
@@ -27,98 +32,239 @@ class MediaController:
         # Directly use the root logger
         self.logger = logging.getLogger()  # No need to use __name__ here
 
+        # One thread per core for CPU-bound work, so concurrent files queue
+        # for cores instead of oversubscribing them
+        self._cpu_pool = ThreadPoolExecutor(
+            max_workers=self.config.processing.cpu_workers, thread_name_prefix="cpu"
+        )
+
         # Initialize dependencies
-        self.file_manager = FileManager(config)
+        self.file_manager = FileManager(config, cpu_pool=self._cpu_pool)
         self.metadata = MetadataService(config)
-        self.api = APIClient(config)
+        self.api = get_api_client(config)
         self.image_processor = ImageProcessor(
-            config, self.metadata, self.api, self.file_manager
+            config, self.metadata, self.api, self.file_manager, cpu_pool=self._cpu_pool
+        )
+        # self.video_processor = VideoProcessor(
+        #     config, self.metadata, self.api, self.file_manager, cpu_pool=self._cpu_pool
+        # )
+        self.task_runner = TaskRunner(
+            self.config,
+            max_concurrent=self.config.processing.task_concurrency,
+            cpu_executor=self._cpu_pool,
+        )
+        # Threads for directory scans, which are bound by syscall latency
+        self._scan_pool = ThreadPoolExecutor(
+            max_workers=self.config.processing.scan_workers,
+            thread_name_prefix="scan",
         )
-        # self.video_processor = VideoProcessor(config, self.file_manager)
-        self.task_runner = TaskRunner(self.config, max_concurrent=1)
 
-        # Set to track processed files
-        self.processed_files = set()
+        # Track processed files as (path, mtime_ns); persisted when state_db is set
+        self.processed_files = ProcessedStore(self.config.paths.state_db)
+        # Files handed to the task runner but not finished yet
+        self._queued_files = set()
+        # Lowercased once, so ".JPG" matches and lookups are a single hash
+        self._image_exts = frozenset(e.lower() for e in config.image_extensions)
+        self._video_exts = frozenset(e.lower() for e in config.video_extensions)
+        self._min_age_ns = int(config.processing.min_file_age * 1e9)
+        # Destination folders may sit inside the watch folder; files moved there
+        # are done, so neither scans nor file events walk back into them
+        self._excluded_dirs = frozenset(
+            os.path.abspath(d)
+            for d in (config.paths.image_dest, config.paths.video_dest)
+        )
 
     async def start(self):
         """Main entry point to start processing"""
         self.logger.info("Starting media workflow")
-        await asyncio.gather(self._watch_directory(), self.task_runner.run())
+        # Sized pool behind every asyncio.to_thread / run_in_executor(None, ...)
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=self.config.processing.thread_pool_size)
+        )
+        runner = asyncio.create_task(self.task_runner.run())
+        try:
+            try:
+                await self._watch_directory()
+            finally:
+                # Stop taking new files, then let the queued ones finish; a
+                # second interrupt cancels the drain
+                if not runner.done():
+                    self.logger.info(
+                        "Finishing %d queued files", self.task_runner.queue.qsize()
+                    )
+                    await self.task_runner.stop()
+                await runner
+        finally:
+            await self.api.aclose()
+            await get_exiftool().close()
+            self.processed_files.close()
+            self._scan_pool.shutdown(wait=False)
+            self._cpu_pool.shutdown(wait=False)
 
     async def _watch_directory(self):
+        watcher = None
+        if self.config.processing.use_fs_events:
+            watcher = DirectoryWatcher(
+                os.path.abspath(self.config.paths.watch_dir),
+                self._image_exts | self._video_exts,
+                recursive=self.config.processing.recursive_search,
+                excluded_dirs=self._excluded_dirs,
+            )
+            try:
+                watcher.start()
+            except ImportError:
+                self.logger.warning("watchdog is not installed, polling for new files")
+                watcher = None
+
+        if watcher is None:
+            await self._poll_directory()
+            return
+
+        sweep = None
+        try:
+            # Files already in the folder produce no events: sweep once now, and
+            # once more when the files that were too recent have aged enough
+            await self._sweep_directory()
+            sweep = asyncio.create_task(self._delayed_sweep())
+            while True:
+                await self._process_file(await watcher.get())
+        finally:
+            if sweep is not None:
+                sweep.cancel()
+            watcher.stop()
+
+    async def _delayed_sweep(self):
+        await asyncio.sleep(self.config.processing.min_file_age)
+        await self._sweep_directory()
+
+    async def _poll_directory(self):
         while True:
-            for file_path in self._find_new_files():
-                await self._process_file(file_path)
+            await self._sweep_directory()
             await asyncio.sleep(self.config.processing.watch_interval)
 
-    def _find_new_files(self) -> list[Path]:
-        """Finds new files in the input folder, optionally recursively, that are older than the configured file age."""
+    async def _sweep_directory(self):
+        # Files are queued as their directory is listed, before the walk finishes
+        async for file_path, st in self._scan_iter():
+            await self._process_file(file_path, st)
+
+    async def _scan_iter(self) -> AsyncIterator[tuple[Path, os.stat_result]]:
+        """Yields new files in the input folder, optionally recursively, that are older than the configured file age.
+
+        Directories are listed in the scan pool, several at a time, and their
+        files are yielded as each listing completes (sorted per directory).
+        """
         input_path = Path(self.config.paths.watch_dir)
-        min_age = self.config.processing.min_file_age  # Age in seconds
-        now = time.time()
+        now_ns = time.time_ns()
 
         if not input_path.exists() or not input_path.is_dir():
             self.logger.warning(
                 f"Input folder {input_path} does not exist or is not a directory."
             )
-            return []
+            return
+
+        loop = asyncio.get_running_loop()
+        recursive = self.config.processing.recursive_search
+        max_pending = self.config.processing.scan_workers
+        todo = [os.path.abspath(input_path)]
+        pending = set()
+        while todo or pending:
+            # Keep the pool busy: overlapping readdir/stat latency across directories
+            while todo and len(pending) < max_pending:
+                pending.add(
+                    loop.run_in_executor(
+                        self._scan_pool, self._list_new_files, todo.pop(), now_ns
+                    )
+                )
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for future in done:
+                try:
+                    files, subdirs = future.result()
+                except OSError as e:
+                    # Removed, unmounted or unreadable mid-sweep: skip just this one
+                    self.logger.warning("Skipping directory during scan: %s", e)
+                    continue
+                if recursive:
+                    todo.extend(d for d in subdirs if d not in self._excluded_dirs)
+                for path, st in files:
+                    yield Path(path), st
 
+    def _list_new_files(self, directory: str, now_ns: int):
+        """Blocking: a directory's files that are old enough and not processed
+        yet (sorted), and its subdirectories.
+
+        Runs in the scan pool, so the processed store lookups stay off the loop.
+        """
+        files, subdirs = self._scandir_one(directory)
+        files.sort(key=lambda item: item[0])
         new_files = []
-        if self.config.processing.recursive_search:
-            for root, _, files in os.walk(input_path):
-                for filename in files:
-                    file_path = Path(root) / filename
-                    file_age = now - file_path.stat().st_mtime
-                    if (
-                        file_age >= min_age
-                        and str(file_path) not in self.processed_files
-                    ):
-                        new_files.append(file_path)
-                    else:
-                        self.logger.debug(
-                            f"Skipping {file_path} (too recent, age: {file_age:.2f}s or already processed)"
-                        )
-        else:
-            for file_path in input_path.iterdir():
-                if file_path.is_file():
-                    file_age = now - file_path.stat().st_mtime
-                    if (
-                        file_age >= min_age
-                        and str(file_path) not in self.processed_files
-                    ):
-                        new_files.append(file_path)
-                    else:
-                        self.logger.debug(
-                            f"Skipping {file_path} (too recent, age: {file_age:.2f}s or already processed)"
-                        )
-
-        # Sort the new_files list alphabetically by the full path
-        return sorted(new_files, key=lambda path: str(path))
-
-    async def _process_file(self, file_path: Path):
-        media_type = (
-            "image" if file_path.suffix in self.config.image_extensions else "video"
-        )
-        # Check if the file has already been processed
-        if str(file_path) in self.processed_files:
-            self.logger.debug(f"File {file_path} has already been processed, skipping.")
+        for path, st in files:
+            # Integer nanoseconds: no float conversion per file
+            age_ns = now_ns - st.st_mtime_ns
+            if age_ns >= self._min_age_ns and not self.processed_files.seen(
+                path, st.st_mtime_ns
+            ):
+                new_files.append((path, st))
+            elif self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(
+                    "Skipping %s (too recent, age: %.2fs or already processed)",
+                    path,
+                    age_ns / 1e9,
+                )
+        return new_files, subdirs
+
+    @staticmethod
+    def _scandir_one(directory: str):
+        """List one directory: ([(path, stat_result), ...], [subdirectory, ...]).
+
+        os.scandir returns the file type with each entry, so telling files from
+        directories costs no extra syscall and only files get stat()ed. Files
+        that vanish or can't be stat()ed are left out; errors listing the
+        directory itself propagate to the caller.
+        """
+        files, subdirs = [], []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    try:
+                        files.append((entry.path, entry.stat(follow_symlinks=False)))
+                    except OSError:
+                        continue  # Moved or deleted since it was listed
+        return files, subdirs
+
+    async def _process_file(self, file_path: Path, st: Optional[os.stat_result] = None):
+        extension = os.path.splitext(file_path)[1].lower()
+        media_type = "image" if extension in self._image_exts else "video"
+        if st is None:
+            # File events carry no stat result; scans pass theirs along
+            st = await asyncio.to_thread(self._unprocessed_stat, file_path)
+            if st is None:
+                return
+        # A sweep and a file event can report the same file while it waits
+        if str(file_path) in self._queued_files:
             return
+        self._queued_files.add(str(file_path))
 
         await self.task_runner.add_task(
-            lambda: self._process_media(file_path, media_type)
+            lambda: self._process_media(file_path, media_type, st)
         )
 
-    async def _process_media(self, file_path: Path, media_type: str):
+    async def _process_media(
+        self, file_path: Path, media_type: str, st: os.stat_result
+    ):
         try:
 
             if self.config.processing.simulate_processing:
                 self.logger.info(
-                    f"Simulating processing for {file_path} ({media_type})"
+                    "Simulating processing for %s (%s)", file_path, media_type
                 )
                 results = {"status": "simulated", "file": str(file_path)}
             else:
                 if media_type == "image":
-                    results = await self.image_processor.process(file_path)
+                    results = await self.image_processor.process(file_path, st)
 
                 else:
                     pass
@@ -126,7 +272,35 @@ class MediaController:
                 # self.metadata.write_metadata(file_path, results, media_type)
                 pass
                 # Mark the file as processed only if processing was successful
-            self.processed_files.add(str(file_path))
+            await asyncio.to_thread(self._mark_processed, file_path, st)
         except Exception as e:
-            self.logger.error(f"Failed processing {file_path}: {e}")
-            self.processed_files.add(str(file_path))
+            self.logger.error("Failed processing %s: %s", file_path, e)
+            await asyncio.to_thread(self._mark_processed, file_path, st)
+        finally:
+            self._queued_files.discard(str(file_path))
+
+    def _unprocessed_stat(self, file_path: Path) -> Optional[os.stat_result]:
+        """Blocking: the file's stat result, or None if it is gone or processed"""
+        try:
+            st = os.stat(file_path)
+        except FileNotFoundError:
+            return None
+        if self.processed_files.seen(str(file_path), st.st_mtime_ns):
+            self.logger.debug(
+                "File %s has already been processed, skipping.", file_path
+            )
+            return None
+        return st
+
+    def _mark_processed(self, file_path: Path, st: os.stat_result):
+        """Blocking: record the file with its mtime after processing.
+
+        Writing metadata changes the mtime, so a file that stays in the watch
+        folder is re-stat()ed; otherwise the next sweep would see a new
+        version and process it again.
+        """
+        try:
+            mtime_ns = os.stat(file_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime_ns = st.st_mtime_ns  # Moved to its destination
+        self.processed_files.mark(str(file_path), mtime_ns)
@@ -4,49 +4,147 @@
 # It supports reading, writing, and modifying metadata such as creation times, GPS coordinates, ratings, and other IPTC fields.
 
 
-import exiftool
 from pathlib import Path
 import logging
 from typing import Dict, Any, Optional, List
 
-import logging
-from log_service import setup_logging
-import subprocess
-import json
+from exiftool_daemon import get_exiftool
+import orjson
+
+
+# Keyword handlers fill two ordered sets: `pending` holds what += must add to the
+# file, `complete` every keyword the fields want kept, used when any field
+# overwrites and the list is assigned with = instead. They return True to replace.
+def _overwrite_keywords(
+    existing: set, new: List[str], pending: dict, complete: dict
+) -> bool:
+    complete.update(dict.fromkeys(new))
+    return True
+
+
+def _append_keywords(
+    existing: set, new: List[str], pending: dict, complete: dict
+) -> bool:
+    complete.update(dict.fromkeys(new))
+    for keyword in new:
+        if keyword not in existing:  # Avoid duplicates
+            # Later fields (tags, colors, faces) must not add them again
+            existing.add(keyword)
+            pending[keyword] = None
+    return False
+
+
+def _keep_keywords(
+    existing: set, new: List[str], pending: dict, complete: dict
+) -> bool:
+    return False
+
+
+def _flatten_geotag(components: Dict[str, Any]) -> List[str]:
+    """Keyword values of reverse geocoding components; list values are expanded"""
+    keywords = []
+    for value in components.values():
+        for item in value if isinstance(value, list) else (value,):
+            if item not in (None, ""):
+                keywords.append(str(item))
+    return keywords
+
+
+def _overwrite_caption(existing: str, caption: str) -> List[str]:
+    return [f"-IPTC:Caption-Abstract={caption}"]
+
+
+def _append_caption(existing: str, caption: str) -> List[str]:
+    if caption.strip() in existing:
+        return []
+    return [f"-IPTC:Caption-Abstract={existing} {caption}".strip()]
+
+
+def _overwrite_field(key: str, value: Any, existing: Any) -> List[str]:
+    return [f"-IPTC:{key}={value}"]
+
+
+def _append_field(key: str, value: Any, existing: Any) -> List[str]:
+    return [] if value in existing else [f"-IPTC:{key}+={value}"]
+
+
+def _do_nothing(*args) -> List[str]:
+    return []
+
+
+# Keywords such as place names may contain commas, so they are joined on ";"
+_KEYWORD_SEP = ";"
+
+# metadata_behavior -> how each kind of field is written
+_KEYWORD_HANDLERS = {
+    "overwrite": _overwrite_keywords,
+    "append": _append_keywords,
+    "do_nothing": _keep_keywords,
+}
+_CAPTION_HANDLERS = {
+    "overwrite": _overwrite_caption,
+    "append": _append_caption,
+    "do_nothing": _do_nothing,
+}
+_FIELD_HANDLERS = {
+    "overwrite": _overwrite_field,
+    "append": _append_field,
+    "do_nothing": _do_nothing,
+}
 
 
 class MetadataService:
     def __init__(self, config):
         self.config = config
+        # Logging is configured once by the application entry point
         self.logger = logging.getLogger(__name__)
-        # Setup logging before using it
-        setup_logging(config)  # Make sure logging is configured
-
-        # Directly use the root logger
-        self.logger = logging.getLogger()  # No need to use __name__ here
+        # Shared `exiftool -stay_open` process, no Perl start-up per call
+        self.exiftool = get_exiftool()
+
+        # Resolved once: write_metadata looks up a handler per field, no string ladders
+        behavior = config.processing.metadata_behavior
+        if isinstance(behavior, dict):
+            self._behaviors, self._default_behavior = dict(behavior), "append"
+        else:
+            self._behaviors, self._default_behavior = {}, behavior
+        for value in {self._default_behavior, *self._behaviors.values()}:
+            if value not in _KEYWORD_HANDLERS:
+                raise ValueError(f"Unknown metadata_behavior: {value!r}")
+
+    async def _run_exiftool(self, *args: str) -> bytes:
+        """Run one exiftool command without blocking the event loop.
+
+        Commands go to the shared stay_open process; RuntimeError on failure.
+        """
+        return await self.exiftool.execute(*args)
 
     async def get_creation_time(self, file_path: Path) -> str:
         """Get media creation datetime using exiftool"""
-        with exiftool.ExifTool() as et:
-            metadata = et.get_metadata(str(file_path))
-            return metadata.get("EXIF:DateTimeOriginal") or metadata.get(
-                "QuickTime:CreateDate"
-            )
-
-    async def get_gps_coordinates(self, file_path: Path) -> Optional[Dict]:
-        """Extract GPS coordinates using exiftool via subprocess"""
+        metadata = await self.exiftool.get_metadata(
+            file_path, "-G", "-EXIF:DateTimeOriginal", "-QuickTime:CreateDate"
+        )
+        return metadata.get("EXIF:DateTimeOriginal") or metadata.get(
+            "QuickTime:CreateDate"
+        )
+
+    async def read_metadata(self, file_path: Path) -> Dict[str, Any]:
+        """Read all metadata of a file once, for reuse by the other methods"""
         try:
-            result = subprocess.run(
-                ["exiftool", "-json", "-GPSLatitude", "-GPSLongitude", str(file_path)],
-                capture_output=True,
-                text=True,
-                check=True,
-            )
-            metadata = json.loads(result.stdout)
-            if not metadata or not isinstance(metadata, list):
-                return None
-
-            gps_data = metadata[0]
+            return await self.exiftool.get_metadata(file_path, "-s3")
+        except (RuntimeError, orjson.JSONDecodeError, IndexError):
+            return {}
+
+    async def get_gps_coordinates(
+        self, file_path: Path, metadata: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict]:
+        """Extract GPS coordinates, from already read `metadata` when given"""
+        try:
+            if metadata is None:
+                gps_data = await self.exiftool.get_metadata(
+                    file_path, "-GPSLatitude", "-GPSLongitude"
+                )
+            else:
+                gps_data = metadata
             lat = gps_data.get("GPSLatitude")
             lon = gps_data.get("GPSLongitude")
 
@@ -56,254 +154,95 @@ class MetadataService:
             return {"lat": lat, "lon": lon}
 
         except Exception as e:
-            print(f"Error extracting GPS: {e}")
+            self.logger.warning("Error extracting GPS from %s: %s", file_path, e)
             return None
 
     async def write_metadata(
-        self, file_path: Path, data: Dict[str, Any], media_type: str
+        self,
+        file_path: Path,
+        data: Dict[str, Any],
+        media_type: str,
+        existing_metadata: Optional[Dict[str, Any]] = None,
     ):
-        """Write metadata to a file using exiftool, respecting configured behavior (overwrite, append, do_nothing)."""
+        """Write metadata to a file using exiftool, respecting configured behavior (overwrite, append, do_nothing).
 
-        # Read existing metadata
-        try:
-            result = subprocess.run(
-                ["exiftool", "-j", "-s3", str(file_path)],
-                capture_output=True,
-                text=True,
-                check=True,
-            )
-            existing_metadata = json.loads(result.stdout)[0]
-        except (subprocess.CalledProcessError, json.JSONDecodeError, IndexError):
-            existing_metadata = {}
-
-        command = ["exiftool", "-q", "-overwrite_original"]
-        metadata_behavior = self.config.processing.metadata_behavior
-        exif_args = []
-
-        def handle_keywords(values: List[str]):
-            """Handle keyword metadata updates based on behavior settings."""
-            existing_keywords = (
-                set(existing_metadata.get("Keywords", []))
-                if "Keywords" in existing_metadata
-                else set()
-            )
-            new_keywords = set(values)
-
-            if metadata_behavior == "overwrite":
-                return [
-                    f"-IPTC:Keywords={v}" for v in new_keywords
-                ]  # Replace all keywords
-
-            if metadata_behavior == "append":
-                keywords_to_add = new_keywords - existing_keywords  # Avoid duplicates
-                return [f"-IPTC:Keywords+={v}" for v in keywords_to_add]
-
-            return []  # do_nothing: No changes
+        Pass `existing_metadata` (from `read_metadata`) to skip reading the file again.
+        """
 
-        def handle_caption(value: str, label=""):
-            """Handle caption updates based on behavior settings."""
-            existing_caption = existing_metadata.get("Caption-Abstract", "")
-            new_caption = f"\n{label}{value}" if label else value
-
-            if metadata_behavior == "overwrite":
-                return [f"-IPTC:Caption-Abstract={new_caption}"]
+        # Read existing metadata
+        if existing_metadata is None:
+            existing_metadata = await self.read_metadata(file_path)
 
-            if metadata_behavior == "append":
-                if new_caption.strip() not in existing_caption:
-                    return [
-                        f"-IPTC:Caption-Abstract={existing_caption} {new_caption}".strip()
-                    ]
+        exif_args = []
 
-            return []  # do_nothing
+        # Built once per file; exiftool returns a bare string for a single keyword
+        existing_keywords = existing_metadata.get("Keywords") or []
+        if isinstance(existing_keywords, str):
+            existing_keywords = [existing_keywords]
+        existing_keywords = set(existing_keywords)
+        existing_caption = existing_metadata.get("Caption-Abstract", "")
+        # Keywords from every field are written in one assignment at the end
+        pending_keywords = {}
+        complete_keywords = {}
+        replace_keywords = False
 
         # Process metadata fields
         for key, value in data.items():
             if not value:
                 continue  # Skip empty values
+            behavior = self._behaviors.get(key, self._default_behavior)
 
             if key in {"tags", "colors", "faces"}:
-                exif_args.extend(handle_keywords(value))
+                replace_keywords |= _KEYWORD_HANDLERS[behavior](
+                    existing_keywords,
+                    [str(v) for v in value],
+                    pending_keywords,
+                    complete_keywords,
+                )
 
             elif key == "description":
-                exif_args.extend(handle_caption(value))
+                exif_args.extend(_CAPTION_HANDLERS[behavior](existing_caption, value))
 
             elif key == "ocr":
-                exif_args.extend(handle_caption(value, label="OCR: "))
+                exif_args.extend(
+                    _CAPTION_HANDLERS[behavior](existing_caption, f"\nOCR: {value}")
+                )
 
             elif key == "geotag":
-                for geo_key, geo_value in value.items():
-                    exif_args.append(f"-IPTC:Keywords+={geo_value}")
+                _append_keywords(
+                    existing_keywords,
+                    _flatten_geotag(value),
+                    pending_keywords,
+                    complete_keywords,
+                )
 
             else:
-                existing_value = existing_metadata.get(key, "")
-                if metadata_behavior == "overwrite":
-                    exif_args.append(f"-IPTC:{key}={value}")
-                elif metadata_behavior == "append" and value not in existing_value:
-                    exif_args.append(f"-IPTC:{key}+={value}")
+                exif_args.extend(
+                    _FIELD_HANDLERS[behavior](
+                        key, value, existing_metadata.get(key, "")
+                    )
+                )
+
+        # = replaces the whole list, so it must carry every field's keywords,
+        # including those the file already has; += only needs the new ones
+        if replace_keywords:
+            operator, keywords = "=", complete_keywords
+        else:
+            operator, keywords = "+=", pending_keywords
+        if keywords:
+            # -sep splits the list, so any number of keywords costs three arguments
+            exif_args += [
+                "-sep",
+                _KEYWORD_SEP,
+                f"-IPTC:Keywords{operator}{_KEYWORD_SEP.join(keywords)}",
+            ]
 
         # Execute exiftool command
         if exif_args:
-            command.extend(exif_args)
-            command.append(str(file_path))
-            subprocess.run(command, check=True)
+            await self._run_exiftool("-overwrite_original", *exif_args, str(file_path))
             self.logger.info("Metadata written for %s", file_path)
 
-    async def write_metadataOLD(
-        self, file_path: Path, data: Dict[str, Any], media_type: str
-    ):
-        """Write metadata to file using exiftool, considering existing metadata values based on configuration."""
-
-        command = ["exiftool", "-j", "-s3", str(file_path)]
-        existing_metadata = subprocess.run(
-            command, capture_output=True, text=True, check=True
-        ).stdout
-
-        # Parse JSON output to dictionary
-        try:
-            existing_metadata = json.loads(existing_metadata)[0]
-        except json.JSONDecodeError:
-            existing_metadata = {}  # If JSON parsing fails, assume no existing metadata
-
-        command = ["exiftool", "-q", "-overwrite_original"]
-        exif_args = []
-
-        # Use the configured behavior for metadata processing
-        metadata_behavior = self.config.processing.metadata_behavior
-
-        # Collect descriptions and OCR results
-        captions = []
-        for key, value in data.items():
-            if media_type == "image":
-                if key == "tags":
-                    if "Keywords" in existing_metadata:
-                        existing_keywords = existing_metadata["Keywords"]
-                        for v in value:
-                            if v in existing_keywords:
-                                if metadata_behavior == "overwrite":
-                                    exif_args.append(f"-IPTC:Keywords={v}")
-                                # do_nothing would not add this value
-                            else:
-                                if metadata_behavior != "do_nothing":
-                                    exif_args.append(f"-IPTC:Keywords-={v}")
-                                    exif_args.append(f"-IPTC:Keywords+={v}")
-                    else:
-                        # No existing keywords, add all
-                        for v in value:
-                            exif_args.append(f"-IPTC:Keywords+={v}")
-                elif key in ["colors", "faces"]:
-                    # Assuming colors and faces are also handled as keywords
-                    if "Keywords" in existing_metadata:
-                        existing_keywords = existing_metadata["Keywords"]
-                        for v in value:
-                            if v in existing_keywords:
-                                if metadata_behavior == "overwrite":
-                                    exif_args.append(f"-IPTC:Keywords={v}")
-                                # do_nothing would not add this value
-                            else:
-                                if metadata_behavior != "do_nothing":
-                                    exif_args.append(f"-IPTC:Keywords-={v}")
-                                    exif_args.append(f"-IPTC:Keywords+={v}")
-                    else:
-                        for v in value:
-                            exif_args.append(f"-IPTC:Keywords+={v}")
-                elif key == "description":
-                    if "Caption-Abstract" in existing_metadata and len(value):
-                        if metadata_behavior == "append":
-                            captions.append(
-                                existing_metadata["Caption-Abstract"] + " " + value
-                            )
-                        elif metadata_behavior == "overwrite":
-                            captions = [value]
-                        # do_nothing would just not append anything new
-                    else:
-                        captions.append(value)
-                elif key == "ocr":
-                    # Add a newline before OCR results
-                    if "Caption-Abstract" in existing_metadata and len(value):
-                        if metadata_behavior == "append":
-                            captions.append("\nOCR: " + value)
-
-                    else:
-                        captions.append("\nOCR: " + value)
-                elif key == "geotag":
-                    # Add geotag values as keywords
-                    for geo_key, geo_value in value.items():
-                        if isinstance(geo_value, list):  # Handle lists in geotag
-                            for v in geo_value:
-                                exif_args.append(f"-IPTC:Keywords-={v}")
-                                exif_args.append(f"-IPTC:Keywords+={v}")
-                        else:
-                            exif_args.append(f"-IPTC:Keywords+={geo_value}")
-                else:
-                    # For other tags, apply the default behavior which is append
-                    if key in existing_metadata:
-                        if value in existing_metadata[key]:
-                            if metadata_behavior.get(key, "append") == "overwrite":
-                                exif_args.append(f"-IPTC:{key}={value}")
-                            # do_nothing would not write anything
-                        else:
-                            if metadata_behavior.get(key, "append") != "do_nothing":
-                                exif_args.append(f"-IPTC:{key}+={value}")
-                    else:
-                        exif_args.append(f"-IPTC:{key}={value}")
-
-        # Combine all captions into one, with OCR prefixed by a newline
-        if captions:
-            full_caption = " ".join(captions)
-            exif_args.append(f"-IPTC:Caption-Abstract={full_caption}")
-
-        command.extend(exif_args)
-        command.append(str(file_path))  # Add the file path
-
-        subprocess.run(command, check=True)
-        self.logger.info("Metadata written for image %s", file_path)
-
-    async def write_metadataOLD(
-        self, file_path: Path, data: Dict[str, Any], media_type: str
-    ):
-        """Write metadata to file using exiftool with proper mappings, ensuring no duplication."""
-
-        command = ["exiftool", "-q", "-overwrite_original"]
-        exif_args = []
-
-        # Collect descriptions and OCR results
-        captions = []
-        for key, value in data.items():
-            if media_type == "image":
-                if key in ["tags", "colors", "faces"]:
-                    for v in value:
-                        exif_args.append(f"-IPTC:Keywords+={v}")
-                elif key == "description":
-                    captions.append(value)
-                elif key == "ocr":
-                    # Add a newline before OCR results
-                    captions.append("\nOCR: " + value)
-                elif key == "geotag":
-                    # Add geotag values as keywords
-                    for geo_key, geo_value in value.items():
-                        if isinstance(geo_value, list):  # Handle lists in geotag
-                            for v in geo_value:
-                                exif_args.append(f"-IPTC:Keywords+={v}")
-                        else:
-                            exif_args.append(f"-IPTC:Keywords+={geo_value}")
-                else:
-                    exif_args.append(f"-IPTC:{key}={value}")
-
-        # Combine all captions into one, with OCR prefixed by a newline
-        if captions:
-            full_caption = " ".join(captions)
-            exif_args.append(f"-IPTC:Caption-Abstract={full_caption}")
-
-        command.extend(exif_args)
-        command.append(str(file_path))  # Add the file path
-
-        subprocess.run(command, check=True)
-        self.logger.info("Metadata written for image %s", file_path)
-
     async def set_rating(self, rating, fname):
-        # Construct the ExifTool command
-        command = f"exiftool -overwrite_original -Rating={rating} '{fname}'"
-
-        # Run the command
-        subprocess.run(command, shell=True, check=True)
-        self.logger.debug(f"|set_rating| Rating set to {rating} for {fname}")
+        # Arguments are passed as-is, so quotes in the filename need no escaping
+        await self._run_exiftool("-overwrite_original", f"-Rating={rating}", str(fname))
+        self.logger.debug("|set_rating| Rating set to %s for %s", rating, fname)
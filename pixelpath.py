@@ -1,10 +1,10 @@
 import argparse
 import asyncio
-import json
 import os
+import sys
 from pathlib import Path
-from dataclasses import asdict
-from dotenv import load_dotenv
+import orjson
+from dotenv import dotenv_values, find_dotenv, load_dotenv
 
 from config import (
     AppConfig,
@@ -18,13 +18,49 @@ from config import (
     GeneralWorkflowConfig,
 )
 from media_controller import MediaController
-from file_mananger import FileManager
+from file_manager import FileManager
 from task_runner import TaskRunner
 from metadata_service import MetadataService
 from api_client import APIClient
 
+# Parsed .env values, reused while the .env file is unchanged
+ENV_CACHE = Path.home() / ".cache" / "pixelpath_env.json"
+
+
+def load_env():
+    """Load .env into os.environ, from the cache when it is still current.
+
+    Like load_dotenv, variables already set in the environment take precedence.
+    """
+    dotenv_path = find_dotenv()
+    if not dotenv_path:
+        return
+    mtime_ns = os.stat(dotenv_path).st_mtime_ns
+    try:
+        cached = orjson.loads(ENV_CACHE.read_bytes())
+        if cached["dotenv"] == dotenv_path and cached["mtime_ns"] == mtime_ns:
+            for key, value in cached["env"].items():
+                os.environ.setdefault(key, value)
+            return
+    except (OSError, ValueError, KeyError):
+        pass
+
+    load_dotenv(dotenv_path)
+    env = {k: v for k, v in dotenv_values(dotenv_path).items() if v is not None}
+    try:
+        ENV_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        # The file holds API keys: readable by the owner only
+        fd = os.open(ENV_CACHE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(
+                orjson.dumps({"dotenv": dotenv_path, "mtime_ns": mtime_ns, "env": env})
+            )
+    except OSError:
+        pass  # Caching is best effort
+
+
 # Load environment variables
-load_dotenv()
+load_env()
 CLARIFAI_API_KEY = os.getenv("CLARIFAI_API_KEY")
 CLARIFAI_APP_ID = os.getenv("CLARIFAI_APP_ID")
 REVERSE_GEO_API_KEY = os.getenv("REVERSE_GEO_API_KEY")
@@ -57,6 +93,11 @@ def parse_args():
         action="store_true",
         help="Run in simulation mode (no real processing)",
     )
+    parser.add_argument(
+        "--print-config",
+        action="store_true",
+        help="Print the full configuration at startup",
+    )
 
     return parser.parse_args()
 
@@ -129,8 +170,19 @@ async def main():
         logging=LoggingConfig(),
     )
 
-    # Print final configuration
-    print(json.dumps(asdict(config), indent=4))
+    # Print final configuration; the full dump walks every nested dataclass,
+    # so it is only built on request
+    if args.print_config:
+        # orjson serializes the dataclasses directly, without asdict's deep copy
+        sys.stdout.buffer.write(
+            orjson.dumps(config, option=orjson.OPT_INDENT_2, default=str) + b"\n"
+        )
+    else:
+        print(
+            f"Watching {config.paths.watch_dir} "
+            f"(images -> {config.paths.image_dest}, videos -> {config.paths.video_dest}, "
+            f"simulate={config.processing.simulate_processing})"
+        )
 
     controller = MediaController(config)
     await controller.start()
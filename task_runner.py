@@ -1,36 +1,80 @@
 # media_workflow/task_runner.py
 import asyncio
-from typing import Callable, Awaitable
+from concurrent.futures import Executor
+from typing import Any, Callable, Awaitable, Optional
 import logging
 from log_service import setup_logging
 
 
 class TaskRunner:
-    def __init__(self, config, max_concurrent=5):
-        self.logger = logging.getLogger(__name__)
+    def __init__(
+        self,
+        config,
+        max_concurrent=5,
+        queue_maxsize=None,
+        cpu_executor: Optional[Executor] = None,
+    ):
         self.max_concurrent = max_concurrent
-        self.queue = asyncio.Queue()
+        # Blocking "cpu" tasks run here (None: the loop's default executor), so
+        # they never run on the event loop and are capped by the pool size
+        self.cpu_executor = cpu_executor
+        # Bounded, so producers (directory scans) wait instead of queueing a whole tree
+        if queue_maxsize is None:
+            queue_maxsize = 2 * max_concurrent
+        self.queue = asyncio.Queue(maxsize=queue_maxsize)
         # Setup logging before using it
         setup_logging(config)  # Make sure logging is configured
 
         # Directly use the root logger
         self.logger = logging.getLogger()  # No need to use __name__ here
 
-    async def add_task(self, task_func: Callable[[], Awaitable]):
-        await self.queue.put(task_func)
+    async def add_task(self, task_func: Callable[[], Any], kind: str = "io"):
+        """Queue a task; waits while the queue is full.
+
+        "io" tasks return an awaitable and run on the event loop; "cpu" tasks
+        are plain blocking callables and run in `cpu_executor`.
+        """
+        if kind not in ("io", "cpu"):
+            raise ValueError(f"Unknown task kind: {kind}")
+        await self.queue.put((kind, task_func))
+
+    async def stop(self):
+        """Let the workers finish the queued tasks, then make run() return"""
+        for _ in range(self.max_concurrent):
+            await self.queue.put(None)
 
     async def run(self):
         workers = [
             asyncio.create_task(self._worker()) for _ in range(self.max_concurrent)
         ]
-        await asyncio.gather(*workers)
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            # Cancelled or stopped: make sure no worker outlives run()
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
 
     async def _worker(self):
         while True:
-            task_func = await self.queue.get()
+            item = await self.queue.get()
+            if item is None:  # stop() sentinel
+                self.queue.task_done()
+                return
+            kind, task_func = item
             try:
-                await task_func()
+                if kind == "cpu":
+                    await asyncio.get_running_loop().run_in_executor(
+                        self.cpu_executor, task_func
+                    )
+                else:
+                    await task_func()
+            except asyncio.CancelledError:
+                if asyncio.current_task().cancelling():
+                    raise  # The worker itself is being cancelled: shut down
+                # Only the task was cancelled; keep this worker serving the queue
+                self.logger.warning("Task was cancelled")
             except Exception as e:
-                self.logger.error(f"Task failed: {e}")
+                self.logger.error("Task failed: %s", e, exc_info=True)
             finally:
                 self.queue.task_done()
@@ -0,0 +1,89 @@
+# To execute the tests, run the following command from your project root directory:
+
+# python -m unittest discover tests/ -p "test_*.py" -v
+
+
+import asyncio
+import os
+import sys
+import unittest
+from unittest import IsolatedAsyncioTestCase
+
+# Add project root to Python's path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from libs.batch_queue import AsyncBatchQueue
+
+
+class TestAsyncBatchQueue(IsolatedAsyncioTestCase):
+    """Unit tests for the AsyncBatchQueue class."""
+
+    def setUp(self) -> None:
+        """Record every batch handed to the processing function."""
+        self.batches = []
+
+    def double(self, items):
+        self.batches.append(list(items))
+        return [item * 2 for item in items]
+
+    async def test_flush_on_batch_size(self):
+        """Test that a full batch is processed without waiting for the timer."""
+        queue = AsyncBatchQueue(self.double, max_batch_size=3, max_wait_time=60)
+        futures = [await queue.add_request(i) for i in range(3)]
+
+        results = await asyncio.wait_for(asyncio.gather(*futures), timeout=5)
+        self.assertEqual(results, [0, 2, 4])
+        self.assertEqual(self.batches, [[0, 1, 2]])
+
+    async def test_flush_on_timeout(self):
+        """Test that a partial batch is processed once max_wait_time elapses."""
+        queue = AsyncBatchQueue(self.double, max_batch_size=10, max_wait_time=0.05)
+        futures = [await queue.add_request(i) for i in (1, 2)]
+        self.assertEqual(self.batches, [])
+
+        results = await asyncio.wait_for(asyncio.gather(*futures), timeout=5)
+        self.assertEqual(results, [2, 4])
+        self.assertEqual(self.batches, [[1, 2]])
+
+    async def test_overflow_starts_next_batch(self):
+        """Test that items beyond max_batch_size go into the next batch."""
+        queue = AsyncBatchQueue(self.double, max_batch_size=2, max_wait_time=0.05)
+        futures = [await queue.add_request(i) for i in range(3)]
+
+        results = await asyncio.wait_for(asyncio.gather(*futures), timeout=5)
+        self.assertEqual(results, [0, 2, 4])
+        self.assertEqual(self.batches, [[0, 1], [2]])
+
+    async def test_exception_result_fails_only_its_item(self):
+        """Test that an exception returned for one item is raised to that caller only."""
+
+        def process(items):
+            return [ValueError(item) if item == "bad" else item for item in items]
+
+        queue = AsyncBatchQueue(process, max_batch_size=3, max_wait_time=60)
+        futures = [await queue.add_request(item) for item in ("a", "bad", "c")]
+
+        results = await asyncio.wait_for(
+            asyncio.gather(*futures, return_exceptions=True), timeout=5
+        )
+        self.assertEqual(results[0], "a")
+        self.assertIsInstance(results[1], ValueError)
+        self.assertEqual(results[2], "c")
+
+    async def test_raising_process_fn_fails_whole_batch(self):
+        """Test that an exception raised by process_fn reaches every item in the batch."""
+
+        def process(items):
+            raise RuntimeError("model crashed")
+
+        queue = AsyncBatchQueue(process, max_batch_size=2, max_wait_time=60)
+        futures = [await queue.add_request(i) for i in range(2)]
+
+        for fut in futures:
+            with self.assertRaises(RuntimeError):
+                await asyncio.wait_for(fut, timeout=5)
+
+
+if __name__ == "__main__":
+    unittest.main()
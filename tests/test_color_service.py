@@ -0,0 +1,96 @@
+# To execute the tests, run the following command from your project root directory:
+
+# python -m unittest discover tests/ -p "test_*.py" -v
+
+
+import os
+import sys
+import unittest
+from unittest import TestCase
+
+import numpy as np
+
+# Add project root to Python's path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from libs.color_service import nearest_palette, rgb_to_lab
+
+
+def scalar_rgb_to_lab(r, g, b):
+    """Reference sRGB (D65) to CIE Lab conversion, one pixel at a time."""
+
+    def linearize(c):
+        c /= 255.0
+        return ((c + 0.055) / 1.055) ** 2.4 if c > 0.04045 else c / 12.92
+
+    r, g, b = linearize(r), linearize(g), linearize(b)
+    x = (0.4124564 * r + 0.3575761 * g + 0.1804375 * b) / 0.95047
+    y = (0.2126729 * r + 0.7151522 * g + 0.0721750 * b) / 1.0
+    z = (0.0193339 * r + 0.1191920 * g + 0.9503041 * b) / 1.08883
+
+    def f(t):
+        return t ** (1 / 3) if t > 216 / 24389 else (24389 / 27 * t + 16) / 116
+
+    fx, fy, fz = f(x), f(y), f(z)
+    return 116 * fy - 16, 500 * (fx - fy), 200 * (fy - fz)
+
+
+class TestRgbToLab(TestCase):
+    """Unit tests for the vectorized Lab conversion."""
+
+    def test_reference_colors(self):
+        """Test well-known Lab values for black, white and the primaries."""
+        lab = rgb_to_lab(np.array([[0, 0, 0], [255, 255, 255], [255, 0, 0]]))
+        np.testing.assert_allclose(lab[0], [0, 0, 0], atol=1e-3)
+        np.testing.assert_allclose(lab[1], [100, 0, 0], atol=1e-2)
+        np.testing.assert_allclose(lab[2], [53.24, 80.09, 67.20], atol=5e-2)
+
+    def test_matches_scalar_reference(self):
+        """Test random pixels, including dark ones on the linear segments."""
+        rng = np.random.default_rng(0)
+        rgb = np.concatenate(
+            [rng.integers(0, 256, (500, 3)), rng.integers(0, 12, (50, 3))]
+        )
+        expected = np.array([scalar_rgb_to_lab(*map(float, px)) for px in rgb])
+
+        lab = rgb_to_lab(rgb)
+        self.assertEqual(lab.dtype, np.float32)
+        np.testing.assert_allclose(lab, expected, atol=1e-2)
+
+
+class TestNearestPalette(TestCase):
+    """Unit tests for the nearest palette entry search."""
+
+    def setUp(self) -> None:
+        rng = np.random.default_rng(42)
+        self.pixels = rgb_to_lab(rng.integers(0, 256, (2000, 3)))
+        self.palette = rgb_to_lab(rng.integers(0, 256, (24, 3)))
+
+    def brute_force_distances(self):
+        diff = self.pixels[:, None, :].astype(np.float64) - self.palette[None, :, :]
+        return (diff**2).sum(axis=2)
+
+    def assert_nearest(self, indices):
+        distances = self.brute_force_distances()
+        self.assertEqual(indices.shape, (len(self.pixels),))
+        chosen = distances[np.arange(len(self.pixels)), indices]
+        # Compare distances, not indices: float32 may break near-ties differently
+        np.testing.assert_allclose(chosen, distances.min(axis=1), rtol=1e-4, atol=1e-2)
+
+    def test_matches_brute_force(self):
+        """Test that every pixel gets its closest palette entry."""
+        self.assert_nearest(nearest_palette(self.pixels, self.palette))
+
+    def test_chunked_matches_brute_force(self):
+        """Test chunk boundaries, including a short final chunk."""
+        self.assert_nearest(nearest_palette(self.pixels, self.palette, chunk_size=300))
+
+    def test_exact_palette_colors(self):
+        """Test that palette entries map to themselves."""
+        indices = nearest_palette(self.palette, self.palette)
+        np.testing.assert_array_equal(indices, np.arange(len(self.palette)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+# To execute the tests, run the following command from your project root directory:
+
+# python -m unittest discover tests/ -p "test_*.py" -v
+
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import TestCase
+
+# Add project root to Python's path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from libs.disk_cache import DiskCache
+
+
+class TestDiskCache(TestCase):
+    """Unit tests for the DiskCache class."""
+
+    def setUp(self) -> None:
+        """Set up test environment before each test."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = Path(self.temp_dir) / "cache"
+
+    def tearDown(self) -> None:
+        """Clean up after each test."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def age(self, cache, key, seconds):
+        """Backdate an entry's mtime, which eviction orders by."""
+        st = os.stat(cache.path(key))
+        os.utime(cache.path(key), ns=(st.st_atime_ns, st.st_mtime_ns - seconds * 10**9))
+
+    def test_round_trip(self):
+        """Test that a stored entry is returned and a missing one is not."""
+        cache = DiskCache(self.cache_dir, 1024, ".bin")
+        self.assertIsNone(cache.get("a"))
+
+        cache.put("a", b"payload")
+        self.assertEqual(cache.get("a"), b"payload")
+        self.assertEqual(sorted(os.listdir(self.cache_dir)), ["a.bin"])
+
+    def test_evicts_least_recently_used(self):
+        """Test that a full cache drops its oldest entries down to 90% of the limit."""
+        cache = DiskCache(self.cache_dir, 300, ".bin")
+        for key, seconds in (("old", 30), ("mid", 20), ("new", 10)):
+            cache.put(key, b"x" * 100)
+            self.age(cache, key, seconds)
+        # A hit makes "old" the most recently used entry
+        self.assertIsNotNone(cache.get("old"))
+
+        cache.put("next", b"x" * 100)
+        self.assertIsNone(cache.get("mid"))
+        self.assertIsNone(cache.get("new"))
+        self.assertIsNotNone(cache.get("old"))
+        self.assertIsNotNone(cache.get("next"))
+
+    def test_counts_existing_entries(self):
+        """Test that entries left by an earlier run count towards the limit."""
+        DiskCache(self.cache_dir, 10**6, ".bin").put("stale", b"x" * 200)
+        self.age(DiskCache(self.cache_dir, 10**6, ".bin"), "stale", 60)
+        (self.cache_dir / "other.tmp").write_bytes(b"x" * 1000)
+
+        cache = DiskCache(self.cache_dir, 250, ".bin")
+        cache.put("fresh", b"x" * 100)
+        self.assertIsNone(cache.get("stale"))
+        self.assertEqual(cache.get("fresh"), b"x" * 100)
+        # Files without the cache's suffix are left alone
+        self.assertTrue((self.cache_dir / "other.tmp").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
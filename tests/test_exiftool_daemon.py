@@ -0,0 +1,116 @@
+# To execute the tests, run the following command from your project root directory:
+
+# python -m unittest discover tests/ -p "test_*.py" -v
+
+
+import asyncio
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import unittest
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+# Add project root to Python's path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from exiftool_daemon import ExifToolDaemon, _encode_arg
+
+# Speaks the -stay_open protocol: echoes each command's arguments on stdout, and
+# takes its time over any command that contains "slow"
+FAKE_EXIFTOOL = """\
+import sys, time
+args = []
+for line in sys.stdin:
+    line = line.rstrip("\\n")
+    if line == "False" and args == ["-stay_open"]:
+        break
+    if line != "-execute":
+        args.append(line)
+        continue
+    stderr_marker = args[args.index("-echo4") + 1]
+    args = args[: args.index("-echo4")]
+    if "slow" in args:
+        time.sleep(0.5)
+    sys.stdout.write(" ".join(args) + "\\n{ready}\\n")
+    sys.stdout.flush()
+    sys.stderr.write(stderr_marker + "\\n")
+    sys.stderr.flush()
+    args = []
+"""
+
+
+class TestEncodeArg(TestCase):
+    """Unit tests for exiftool argfile encoding."""
+
+    def test_plain_argument_unchanged(self):
+        """Test that single-line arguments, backslashes included, pass through."""
+        self.assertEqual(_encode_arg("-IPTC:Keywords+=a;b"), "-IPTC:Keywords+=a;b")
+        self.assertEqual(_encode_arg(r"C:\photos\a.jpg"), r"C:\photos\a.jpg")
+
+    def test_newline_uses_cstr_escapes(self):
+        """Test that newlines are escaped behind the #[CSTR] prefix."""
+        encoded = _encode_arg("-IPTC:Caption-Abstract=one\nOCR: two")
+        self.assertEqual(encoded, "#[CSTR]-IPTC:Caption-Abstract=one\\nOCR: two")
+        self.assertNotIn("\n", encoded)
+
+    def test_carriage_return_escaped(self):
+        """Test that a bare carriage return also triggers escaping."""
+        self.assertEqual(_encode_arg("a\r\nb\rc"), "#[CSTR]a\\r\\nb\\rc")
+
+    def test_backslashes_escaped_with_newline(self):
+        """Test that backslashes are doubled so they are not read as escapes."""
+        encoded = _encode_arg("path\\to\\n\nnext")
+        self.assertEqual(encoded, "#[CSTR]path\\\\to\\\\n\\nnext")
+
+    def test_round_trip(self):
+        """Test that undoing the C escapes gives back the original argument."""
+        original = "line one\\n literal\r\nline two\\"
+        encoded = _encode_arg(original)
+        self.assertTrue(encoded.startswith("#[CSTR]"))
+        decoded = encoded[len("#[CSTR]") :].encode().decode("unicode_escape")
+        self.assertEqual(decoded, original)
+
+
+class TestExifToolDaemon(IsolatedAsyncioTestCase):
+    """Unit tests for the ExifToolDaemon command protocol."""
+
+    def setUp(self) -> None:
+        """Install a fake exiftool executable."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.executable = os.path.join(self.temp_dir, "exiftool")
+        with open(self.executable, "w") as f:
+            f.write(f"#!{sys.executable}\n{FAKE_EXIFTOOL}")
+        os.chmod(self.executable, os.stat(self.executable).st_mode | stat.S_IEXEC)
+
+    def tearDown(self) -> None:
+        """Clean up after each test."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    async def test_execute_returns_its_own_output(self):
+        """Test that consecutive commands each get their own stdout."""
+        daemon = ExifToolDaemon(self.executable)
+        self.assertEqual(await daemon.execute("-json", "a.jpg"), b"-json a.jpg\n")
+        self.assertEqual(await daemon.execute("b.jpg"), b"b.jpg\n")
+        await daemon.close()
+
+    async def test_cancelled_execute_does_not_leak_output(self):
+        """Test that the command after a cancelled one reads the right output."""
+        daemon = ExifToolDaemon(self.executable)
+        await daemon.execute("warm-up")
+        first_proc = daemon._proc
+
+        # Cancelled after -execute is written, before its output arrives
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(daemon.execute("slow", "a.jpg"), timeout=0.1)
+
+        self.assertEqual(await daemon.execute("b.jpg"), b"b.jpg\n")
+        self.assertIsNot(daemon._proc, first_proc)
+        self.assertIsNotNone(first_proc.returncode)
+        await daemon.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
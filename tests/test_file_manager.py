@@ -52,8 +52,9 @@ class TestFileManager(TestCase):
         result = file_manager.organize_file(temp_file)
 
         # Verify the file was moved correctly
-        dest_path = os.path.join(config['image_dest'], datetime.now().strftime('%Y'), 
-                               f"{datetime.now().month:02d}", "test_image.jpg")
+        now = datetime.now()
+        dest_path = os.path.join(config['image_dest'], f"{now.year:04d}",
+                               f"{now.month:02d}", "test_image.jpg")
         
         self.assertTrue(os.path.exists(dest_path))
         self.assertIn("Moved", result)
@@ -64,8 +65,9 @@ class TestFileManager(TestCase):
         temp_file = os.path.join(self.temp_dir, "test_image.jpg")
         open(temp_file, 'a').close()
 
-        dest_folder = os.path.join(os.getcwd(), 'organized_images', 
-                                 str(datetime.now().year), f"{datetime.now().month:02d}")
+        now = datetime.now()
+        dest_folder = os.path.join(os.getcwd(), 'organized_images',
+                                 f"{now.year:04d}", f"{now.month:02d}")
         os.makedirs(dest_folder, exist_ok=True)
         
         existing_file = os.path.join(dest_folder, "test_image.jpg")
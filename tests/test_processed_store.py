@@ -0,0 +1,89 @@
+# To execute the tests, run the following command from your project root directory:
+
+# python -m unittest discover tests/ -p "test_*.py" -v
+
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import TestCase
+
+# Add project root to Python's path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from libs.processed_store import ProcessedStore
+
+
+class TestProcessedStore(TestCase):
+    """Unit tests for the ProcessedStore class."""
+
+    def setUp(self) -> None:
+        """Set up test environment before each test."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = Path(self.temp_dir) / "state" / "processed.db"
+
+    def tearDown(self) -> None:
+        """Clean up after each test."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_memory_round_trip(self):
+        """Test that a marked version is seen and a modified one is not."""
+        store = ProcessedStore()
+        self.assertFalse(store.seen("/in/a.jpg", 100))
+
+        store.mark("/in/a.jpg", 100)
+        self.assertTrue(store.seen("/in/a.jpg", 100))
+        self.assertFalse(store.seen("/in/a.jpg", 200))
+        self.assertFalse(store.seen("/in/b.jpg", 100))
+
+    def test_mark_replaces_previous_mtime(self):
+        """Test that re-marking a file forgets the version it had before."""
+        store = ProcessedStore(self.db_path)
+        store.mark("/in/a.jpg", 100)
+        store.mark("/in/a.jpg", 200)
+
+        self.assertTrue(store.seen("/in/a.jpg", 200))
+        self.assertFalse(store.seen("/in/a.jpg", 100))
+        store.close()
+
+    def test_persists_across_reopen(self):
+        """Test that marks survive closing and reopening the database."""
+        store = ProcessedStore(self.db_path, commit_every=50)
+        store.mark("/in/a.jpg", 100)
+        store.mark("/in/b.jpg", 300)
+        # Fewer marks than commit_every: close must commit them
+        store.close()
+
+        reopened = ProcessedStore(self.db_path)
+        self.assertTrue(reopened.seen("/in/a.jpg", 100))
+        self.assertTrue(reopened.seen("/in/b.jpg", 300))
+        self.assertFalse(reopened.seen("/in/a.jpg", 101))
+
+        # A modified file is picked up again, then remembered with its new mtime
+        reopened.mark("/in/a.jpg", 101)
+        reopened.close()
+        final = ProcessedStore(self.db_path)
+        self.assertTrue(final.seen("/in/a.jpg", 101))
+        self.assertFalse(final.seen("/in/a.jpg", 100))
+        final.close()
+
+    def test_commits_every_n_marks(self):
+        """Test that batched marks are committed once commit_every is reached."""
+        store = ProcessedStore(self.db_path, commit_every=2)
+        store.mark("/in/a.jpg", 1)
+        store.mark("/in/b.jpg", 2)
+
+        # A second connection only sees committed rows
+        other = ProcessedStore(self.db_path)
+        self.assertTrue(other.seen("/in/a.jpg", 1))
+        self.assertTrue(other.seen("/in/b.jpg", 2))
+        other.close()
+        store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -13,19 +13,51 @@
 # Metadata embedding
 
 # media_workflow/video_processor.py
+import asyncio
+import hashlib
 import logging
-import json
 import subprocess
+from concurrent.futures import Executor
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import cv2
 import numpy as np
+import orjson
+from sklearn.cluster import MiniBatchKMeans
 
-from scenedetect import VideoManager, SceneManager, AdaptiveDetector
-from scenedetect.scene_manager import save_images
-from .metadata_service import MetadataService
-from .api_client import APIClient
-from .file_manager import FileManager
+from scenedetect import open_video, SceneManager, AdaptiveDetector
+from metadata_service import MetadataService
+from api_client import APIClient
+from file_manager import FileManager
+from libs.disk_cache import DiskCache
+
+# Extracted frames only feed the detection APIs and color analysis: quality
+# 75 roughly halves file size and encode time compared to the default 95
+JPEG_QUALITY = 75
+JPEG_PARAMS = [int(cv2.IMWRITE_JPEG_QUALITY), JPEG_QUALITY]
+
+# Scene detection works on frames downscaled by this factor
+_SCENE_DOWNSCALE = 4
+# Pixels sampled from each frame for the color palette
+_SAMPLES_PER_FRAME = 100
+# Colors in a video's palette
+_PALETTE_COLORS = 3
+# Bytes hashed at the start, middle and end of a video for its cache key
+_HASH_BLOCK = 64 * 1024
+
+
+def _encode_jpeg(frame: np.ndarray) -> bytes:
+    """Encode a BGR frame to JPEG bytes with JPEG_PARAMS"""
+    ok, buffer = cv2.imencode(".jpg", frame, JPEG_PARAMS)
+    if not ok:
+        raise ValueError("JPEG encoding failed")
+    return buffer.tobytes()
+
+
+def _decode_reduced(data: bytes) -> Optional[np.ndarray]:
+    """Decode JPEG bytes at 1/8 scale (the decoder skips most of the IDCT)"""
+    # Color sampling takes 100 pixels per frame, so full resolution is wasted
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_REDUCED_COLOR_8)
 
 
 class VideoProcessor:
@@ -35,32 +67,66 @@ class VideoProcessor:
         metadata: MetadataService,
         api: APIClient,
         file_manager: FileManager,
+        cpu_pool: Optional[Executor] = None,
     ):
         self.config = config
+        # Executor for CPU-bound work; None uses the loop's default executor
+        self.cpu_pool = cpu_pool
         self.metadata = metadata
         self.api = api
         self.file_manager = file_manager
         self.logger = logging.getLogger(__name__)
+        # Settings read in per-frame code, resolved once
+        self._obj_url = config.api.obj_detection_url
+        self._face_url = config.api.face_detection_url
+        self._sampling = tuple(config.processing.sampling_strategy)
+
+        processing = config.processing
+        cache_size = processing.video_colors_cache_size
+        self._colors_cache = (
+            DiskCache(
+                config.paths.ramdisk_dir / "video_colors",
+                cache_size * 1024 * 1024,
+                ".json",
+            )
+            if cache_size > 0
+            else None
+        )
+        # Everything besides the video that shapes its palette: frame selection,
+        # sampling and clustering. Part of the cache key, so changing any of them
+        # doesn't serve palettes computed under the old settings
+        self._colors_settings = orjson.dumps(
+            [
+                processing.scene_threshold,
+                processing.min_scene_length,
+                processing.min_scenes,
+                self._sampling,
+                _SCENE_DOWNSCALE,
+                JPEG_QUALITY,
+                _SAMPLES_PER_FRAME,
+                _PALETTE_COLORS,
+                processing.color_analysis_seed,
+            ]
+        )
 
     async def process(self, video_path: Path) -> Dict:
         """Full video processing pipeline"""
         results = {}
-        temp_dir = None
 
         try:
-            temp_dir = self.file_manager.create_temp_dir(video_path.stem)
-
-            # Core processing steps
-            scene_data = await self._detect_scenes(video_path, temp_dir)
-            audio_path = await self._extract_audio(video_path, temp_dir)
+            # Core processing steps. Key frames and audio stay in memory and
+            # go straight to the APIs; nothing is written to a temp folder
+            scene_data = await self._detect_scenes(video_path)
+            audio_bytes = await self._extract_audio(video_path)
+            frames = scene_data["frames"]
 
             results.update(
                 {
                     "scenes": scene_data["scenes"],
-                    "frames": scene_data["frames"],
-                    "transcription": await self._transcribe_audio(audio_path),
-                    "objects": await self._process_scene_analysis(temp_dir),
-                    "colors": await self._analyze_scene_colors(temp_dir),
+                    "frames": [name for name, _ in frames],
+                    "transcription": await self._transcribe_audio(audio_bytes),
+                    "objects": await self._process_scene_analysis(frames),
+                    "colors": await self._analyze_scene_colors(frames, video_path),
                 }
             )
 
@@ -70,17 +136,20 @@ class VideoProcessor:
             return results
 
         except Exception as e:
-            self.logger.error(f"Video processing failed for {video_path}: {str(e)}")
+            self.logger.error(
+                "Video processing failed for %s: %s", video_path, e, exc_info=True
+            )
             return {}
-        finally:
-            if temp_dir:
-                await self.file_manager.cleanup_temp_dir(temp_dir)
 
-    async def _detect_scenes(self, video_path: Path, output_dir: Path) -> Dict:
-        """Detect scenes and extract key frames"""
+    async def _detect_scenes(self, video_path: Path) -> Dict:
+        """Detect scenes and extract key frames as (name, JPEG bytes) pairs"""
         try:
-            video_manager = VideoManager([str(video_path)])
+            video = open_video(str(video_path))
             scene_manager = SceneManager()
+            # Detect on frames downscaled 4x: far fewer pixels per frame for
+            # the detector, and scene cuts survive the downscale
+            scene_manager.auto_downscale = False
+            scene_manager.downscale = _SCENE_DOWNSCALE
             scene_manager.add_detector(
                 AdaptiveDetector(
                     adaptive_threshold=self.config.processing.scene_threshold,
@@ -88,57 +157,63 @@ class VideoProcessor:
                 )
             )
 
-            video_manager.set_downscale_factor()
-            video_manager.start()
-            scene_manager.detect_scenes(frame_source=video_manager)
+            scene_manager.detect_scenes(video=video)
             scene_list = scene_manager.get_scene_list()
 
             if len(scene_list) >= self.config.processing.min_scenes:
-                frame_files = save_images(
-                    scene_list,
-                    video_manager,
-                    output_dir=str(output_dir),
-                    num_images=1,
-                    image_extension="jpg",
-                )
+                frames = []
+                for i, (start, end) in enumerate(scene_list, 1):
+                    # The middle frame of each scene, as save_images picks it
+                    video.seek(start + (end.get_frames() - start.get_frames()) // 2)
+                    frame = video.read()
+                    if frame is not False:
+                        frames.append((f"scene_{i:03d}.jpg", _encode_jpeg(frame)))
                 return {
                     "scenes": [scene[1].get_timecode() for scene in scene_list],
-                    "frames": [Path(f) for f in frame_files],
+                    "frames": frames,
                 }
 
-            return await self._fallback_sampling(video_path, output_dir)
+            return await self._fallback_sampling(video_path)
 
         except Exception as e:
-            self.logger.error(f"Scene detection failed: {str(e)}")
-            return await self._fallback_sampling(video_path, output_dir)
+            self.logger.error("Scene detection failed: %s", e, exc_info=True)
+            return await self._fallback_sampling(video_path)
 
-    async def _fallback_sampling(self, video_path: Path, output_dir: Path) -> Dict:
+    async def _fallback_sampling(self, video_path: Path) -> Dict:
         """Fallback frame sampling strategy"""
+        cap = None
         try:
             frames = []
             cap = cv2.VideoCapture(str(video_path))
             total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
 
-            for ratio in self.config.processing.sampling_strategy:
-                frame_pos = int(total_frames * ratio)
-                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_pos)
-                ret, frame = cap.read()
+            # One forward pass instead of a seek per sample: each seek decodes
+            # again from the previous keyframe. grab() skips the color
+            # conversion for the frames in between.
+            targets = sorted(
+                (int(total_frames * ratio), ratio) for ratio in self._sampling
+            )
+            position = 0
+            for frame_pos, ratio in targets:
+                while position < frame_pos and cap.grab():
+                    position += 1
+                if position < frame_pos or not cap.grab():
+                    break  # The stream ended early
+                position += 1
+                ret, frame = cap.retrieve()
                 if ret:
-                    frame_path = output_dir / f"frame_{ratio*100:.0f}.jpg"
-                    cv2.imwrite(str(frame_path), frame)
-                    frames.append(frame_path)
+                    frames.append((f"frame_{ratio*100:.0f}.jpg", _encode_jpeg(frame)))
 
             return {"scenes": ["full_video"], "frames": frames}
         except Exception as e:
-            self.logger.error(f"Fallback sampling failed: {str(e)}")
+            self.logger.error("Fallback sampling failed: %s", e, exc_info=True)
             return {"scenes": [], "frames": []}
+        finally:
+            if cap is not None:
+                cap.release()
 
-    async def _extract_audio(
-        self, video_path: Path, output_dir: Path
-    ) -> Optional[Path]:
-        """Extract audio track from video"""
-        audio_path = output_dir / "audio.aac"
-
+    async def _extract_audio(self, video_path: Path) -> Optional[bytes]:
+        """Extract the audio track from video, in memory"""
         try:
             cmd = [
                 "ffmpeg",
@@ -150,99 +225,190 @@ class VideoProcessor:
                 "copy",
                 "-loglevel",
                 "error",
-                str(audio_path),
+                # ADTS-framed AAC on stdout: no temp file to write and read back
+                "-f",
+                "adts",
+                "pipe:1",
             ]
 
             process = await asyncio.create_subprocess_exec(
                 *cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE
             )
 
-            _, stderr = await process.communicate()
+            audio_bytes, stderr = await process.communicate()
             if process.returncode != 0:
                 raise RuntimeError(f"FFmpeg error: {stderr.decode()}")
 
-            return audio_path
+            return audio_bytes or None
         except Exception as e:
-            self.logger.error(f"Audio extraction failed: {str(e)}")
+            self.logger.error("Audio extraction failed: %s", e, exc_info=True)
             return None
 
-    async def _transcribe_audio(self, audio_path: Optional[Path]) -> str:
+    async def _transcribe_audio(self, audio_bytes: Optional[bytes]) -> str:
         """Transcribe audio using API"""
-        if not audio_path or not audio_path.exists():
+        if not audio_bytes:
             return ""
 
         try:
+            # transcribe_size_threshold is in MB
             model_size = (
                 "large"
-                if audio_path.stat().st_size
-                < self.config.processing.transcribe_size_threshold
+                if len(audio_bytes)
+                < self.config.processing.transcribe_size_threshold * 1024 * 1024
                 else "medium"
             )
 
             response = await self.api.post_request(
                 self.config.api.transcribe_url,
-                {"audio": str(audio_path), "model": model_size},
+                {"model": model_size},
+                files={"audio": ("audio.aac", audio_bytes, "audio/aac")},
             )
 
             return response.get("transcription", "") if response else ""
         except Exception as e:
-            self.logger.error(f"Transcription failed: {str(e)}")
+            self.logger.error("Transcription failed: %s", e, exc_info=True)
             return ""
 
-    async def _process_scene_analysis(self, scene_dir: Path) -> Dict:
-        """Analyze extracted frames for objects and faces"""
-        results = {"objects": [], "faces": []}
+    async def _process_scene_analysis(self, frames: List[Tuple[str, bytes]]) -> Dict:
+        """Analyze extracted (name, JPEG bytes) frames for objects and faces"""
+        # Sets deduplicate while collecting
+        found = {"objects": set(), "faces": set()}
 
         try:
-            for frame in scene_dir.glob("*.jpg"):
-                # Process objects
-                obj_response = await self.api.post_request(
-                    self.config.api.obj_detection_url, {"image": str(frame)}
-                )
-                if obj_response:
-                    results["objects"].extend(obj_response.get("objects", []))
+            # All requests are independent: send them concurrently, capped so a
+            # long video does not open hundreds of connections at once
+            sem = asyncio.Semaphore(self.config.processing.max_concurrent_api)
+
+            async def post(url: str, frame: Tuple[str, bytes]) -> Optional[dict]:
+                name, data = frame
+                async with sem:
+                    return await self.api.post_request(
+                        url, {}, files={"image": (name, data, "image/jpeg")}
+                    )
+
+            obj_responses, face_responses = await asyncio.gather(
+                asyncio.gather(
+                    *(post(self._obj_url, f) for f in frames),
+                    return_exceptions=True,
+                ),
+                asyncio.gather(
+                    *(post(self._face_url, f) for f in frames),
+                    return_exceptions=True,
+                ),
+            )
 
-                # Process faces
-                face_response = await self.api.post_request(
-                    self.config.api.face_detection_url, {"image": str(frame)}
-                )
-                if face_response:
-                    results["faces"].extend(face_response.get("faces", []))
+            for field, responses in (
+                ("objects", obj_responses),
+                ("faces", face_responses),
+            ):
+                for (name, _), response in zip(frames, responses):
+                    if isinstance(response, BaseException):
+                        self.logger.error(
+                            "Scene analysis (%s) failed for %s: %s",
+                            field,
+                            name,
+                            response,
+                        )
+                    elif response:
+                        found[field].update(response.get(field, []))
+        except Exception as e:
+            self.logger.error("Scene analysis failed: %s", e, exc_info=True)
 
-            # Deduplicate results
-            results["objects"] = list(set(results["objects"]))
-            results["faces"] = list(set(results["faces"]))
+        return {field: list(values) for field, values in found.items()}
 
-            return results
-        except Exception as e:
-            self.logger.error(f"Scene analysis failed: {str(e)}")
-            return results
+    async def _analyze_scene_colors(
+        self, frames: List[Tuple[str, bytes]], video_path: Optional[Path] = None
+    ) -> List[str]:
+        """Analyze dominant colors across all (name, JPEG bytes) frames.
 
-    async def _analyze_scene_colors(self, scene_dir: Path) -> List[str]:
-        """Analyze dominant colors across all frames"""
+        With `video_path`, the palette is cached by the video's content, so
+        re-processing the same file skips decoding and clustering.
+        """
         try:
-            color_samples = []
-            for frame in scene_dir.glob("*.jpg"):
-                img = cv2.imread(str(frame))
-                img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+            cache_key = None
+            if video_path is not None and self._colors_cache is not None:
+                # Hashing and cache reads are blocking file I/O
+                cache_key, cached = await asyncio.to_thread(
+                    self._cached_colors, video_path
+                )
+                if cached is not None:
+                    self.logger.debug("Color cache hit for %s", video_path)
+                    return cached
+
+            seed = self.config.processing.color_analysis_seed
+            rng = np.random.default_rng(seed)
+            # Samples go straight into one contiguous array, no list of rows
+            samples = np.empty((len(frames) * _SAMPLES_PER_FRAME, 3), np.uint8)
+            filled = 0
+            # OpenCV releases the GIL while decoding, so the frames decode in
+            # parallel on the CPU pool, off the event loop
+            loop = asyncio.get_running_loop()
+            images = await asyncio.gather(
+                *(
+                    loop.run_in_executor(self.cpu_pool, _decode_reduced, data)
+                    for _, data in frames
+                )
+            )
+            for img in images:
+                if img is None:
+                    continue
                 pixels = img.reshape(-1, 3)
-                color_samples.extend(pixels[np.random.choice(pixels.shape[0], 100)])
+                idx = rng.integers(0, pixels.shape[0], _SAMPLES_PER_FRAME)
+                # BGR -> RGB on the sampled rows only, not the whole frame
+                samples[filled : filled + _SAMPLES_PER_FRAME] = pixels[idx, ::-1]
+                filled += _SAMPLES_PER_FRAME
 
-            kmeans = KMeans(
-                n_clusters=3,
-                n_init=10,
-                random_state=self.config.processing.color_analysis_seed,
+            kmeans = MiniBatchKMeans(
+                n_clusters=_PALETTE_COLORS, n_init=3, batch_size=256, random_state=seed
             )
-            kmeans.fit(color_samples)
+            kmeans.fit(samples[:filled].astype(np.float32))
 
-            return [self._rgb_to_hex(center) for center in kmeans.cluster_centers_]
+            # One conversion for all centers, then plain ints into the format
+            centers = np.clip(kmeans.cluster_centers_, 0, 255).astype(np.uint8).tolist()
+            colors = ["#%02x%02x%02x" % tuple(center) for center in centers]
+
+            if cache_key:
+                await asyncio.to_thread(self._store_colors, cache_key, colors)
+            return colors
         except Exception as e:
-            self.logger.error(f"Color analysis failed: {str(e)}")
+            self.logger.error("Color analysis failed: %s", e, exc_info=True)
             return []
 
-    def _rgb_to_hex(self, rgb: np.ndarray) -> str:
-        """Convert RGB array to hexadecimal color code"""
-        return "#{:02x}{:02x}{:02x}".format(int(rgb[0]), int(rgb[1]), int(rgb[2]))
+    def _colors_cache_key(self, video_path: Path) -> str:
+        """Palette cache key for a video under the current settings"""
+        # Hashing the size and three sampled blocks identifies a file without
+        # reading all of it
+        size = video_path.stat().st_size
+        digest = hashlib.blake2b(
+            f"{size} ".encode() + self._colors_settings, digest_size=16
+        )
+        with open(video_path, "rb") as f:
+            for offset in (0, size // 2, max(size - _HASH_BLOCK, 0)):
+                f.seek(offset)
+                digest.update(f.read(_HASH_BLOCK))
+        return digest.hexdigest()
+
+    def _cached_colors(
+        self, video_path: Path
+    ) -> Tuple[Optional[str], Optional[List[str]]]:
+        """Blocking: the video's cache key and its cached palette, if any"""
+        try:
+            key = self._colors_cache_key(video_path)
+            data = self._colors_cache.get(key)
+        except OSError as e:
+            self.logger.warning("Color cache unavailable for %s: %s", video_path, e)
+            return None, None
+        try:
+            return key, orjson.loads(data) if data is not None else None
+        except orjson.JSONDecodeError:
+            return key, None  # Truncated entry, analyze again
+
+    def _store_colors(self, key: str, colors: List[str]):
+        """Blocking: write a palette to the cache"""
+        try:
+            self._colors_cache.put(key, orjson.dumps(colors))
+        except OSError as e:
+            self.logger.warning("Could not cache video palette %s: %s", key, e)
 
     async def _write_video_metadata(self, video_path: Path, results: Dict):
         """Write processed results to video metadata"""
@@ -252,9 +418,9 @@ class VideoProcessor:
         }
 
         try:
-            self.metadata.write_metadata(video_path, metadata, "video")
+            await self.metadata.write_metadata(video_path, metadata, "video")
         except Exception as e:
-            self.logger.error(f"Metadata write failed: {str(e)}")
+            self.logger.error("Metadata write failed: %s", e, exc_info=True)
 
     def _format_description(self, results: Dict) -> str:
         """Format video description from analysis results"""
@@ -273,18 +439,18 @@ class VideoProcessor:
 
     def _extract_keywords(self, results: Dict) -> List[str]:
         """Extract keywords from analysis results"""
-        keywords = []
+        keywords: set[str] = set()
 
         if results.get("scenes"):
-            keywords.extend([f"scene_{i+1}" for i in range(len(results["scenes"]))])
+            keywords.update(f"scene_{i+1}" for i in range(len(results["scenes"])))
 
         if results.get("faces"):
-            keywords.extend(results["faces"])
+            keywords.update(results["faces"])
 
         if results.get("objects"):
-            keywords.extend(results["objects"])
+            keywords.update(results["objects"])
 
-        return list(set(keywords))
+        return list(keywords)
 
 
 # # Configuration